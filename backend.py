@@ -1,91 +1,375 @@
-import bpy
+import hashlib
 import numpy as np
-import mathutils
 
+# Termes uniques d'une matrice 3x3 symétrique
+SYMMETRIC_TERMS = [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)]
 
-def compute_barycenter(data: list) -> tuple:
-    center = (0, 0, 0)
+# Vecteur initial de la méthode de la puissance (unitaire, composantes sans rapport simple)
+POWER_START = np.array([1.0, np.sqrt(2), np.sqrt(3)]) / np.sqrt(6)
 
-    for value in data:
-        center = (center[0] + value[0], center[1] + value[1], center[2] + value[2])
 
-    data_count = len(data)
-    center = (center[0] / data_count, center[1] / data_count, center[2] / data_count)
+def as_points_cloud(data) -> np.ndarray:
+    """Helper to view a points cloud (list of tuples or array) as a (N, 3) float array"""
+    return np.asarray(data, dtype=np.float64).reshape(-1, 3)
 
-    return center
 
+def compute_barycenter(data) -> tuple:
+    points = as_points_cloud(data)
 
-def transform_space(axis: tuple, data: list) -> list:
-    output = []
+    center = points.mean(axis=0)
 
-    for value in data:
-        trans_value = (value[0] - axis[0], value[1] - axis[1], value[2] - axis[2])
-        output.append(trans_value)
+    return tuple(center.tolist())
 
-    return output
 
+def transform_space(axis: tuple, data) -> np.ndarray:
+    points = as_points_cloud(data)
+
+    return points - np.asarray(axis, dtype=np.float64)
 
-def compute_covmatrix(data: list, length: int = None) -> list:
-    if length is None:
-        length = len(data[0])  # nombre de coordonnées pour un point (3 car x, y et z)
 
-    points_count = len(data)  # nombre de points dans le nuage de points
+def compute_covmatrix(data, length: int = None) -> np.ndarray:
+    points = np.asarray(data, dtype=np.float64)
 
-    # On trouve la moyenne en x, y et z
-    average = [0 for _ in range(length)]
+    if length is None:
+        length = points.shape[-1]  # nombre de coordonnées pour un point (3 car x, y et z)
 
-    for i in range(length):
-        for point in data:
-            average[i] += point[i]
-        average[i] /= points_count
+    points = points.reshape(-1, length)
+    points_count = len(points)  # nombre de points dans le nuage de points
 
-    # On initialise M : length x length (ici: 3x3)
-    covMatrix = [
-        [0 for _ in range(length)] for _ in range(length)
-    ]
+    # On centre les données sur leur moyenne en x, y et z
+    centered = points - points.mean(axis=0)
 
-    for i in range(length):
-        for j in range(length):
-            for point in data:
-                covMatrix[i][j] += (average[i] - point[i]) * (average[j] - point[j])
-                covMatrix[i][j] /= points_count - 1
+    # M : length x length (ici: 3x3), estimateur non biaisé
+    covMatrix = centered.T @ centered / max(points_count - 1, 1)
 
     return covMatrix
 
 
-def power_method(M: list, num_simulations: int = 10) -> tuple:
-    np_M = np.array(M)
+def power_iteration(M, max_iterations: int = 100, tolerance: float = 1e-12) -> tuple:
+    """Batched power iteration, stopped once the Rayleigh quotient has converged.
+
+    The members whose result is not certified to be the dominant eigenpair go through `eigh`.
+    """
+    np_M = np.asarray(M, dtype=np.float64).reshape(-1, 3, 3)
+    count = len(np_M)
+
+    # 1) On choisit un vecteur initial quelconque, aligné sur aucun axe : une colonne de M
+    #    peut être orthogonale au vecteur propre dominant, la méthode convergerait vers le second
+    degenerate = ~np.any(np_M, axis=(1, 2))
+
+    V = np.tile(POWER_START, (count, 1))
+    V[degenerate] = (0, 0, 1)
+
+    _lambda = np.einsum('ki,kij,kj->k', V, np_M, V)
+    iterations = np.zeros(count, dtype=np.intp)
+    active = ~degenerate
+
+    # 2) Pour k de 0, 1, 2 ... tant qu'un membre n'a pas convergé
+    for k in range(max_iterations):
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            break
+
+        # a) On calcule M . Vk, puis V(k + 1) normalisé
+        M_dot_V = np.einsum('kij,kj->ki', np_M[idx], V[idx])
+        norm = np.linalg.norm(M_dot_V, axis=1)
+        valid = norm > 0
+        V[idx[valid]] = M_dot_V[valid] / norm[valid, None]
+
+        # b) On calcule le quotient de Rayleigh et on teste la convergence
+        new_lambda = np.einsum('ki,kij,kj->k', V[idx], np_M[idx], V[idx])
+        converged = ~valid | (np.abs(new_lambda - _lambda[idx]) <= tolerance * np.abs(new_lambda))
+
+        _lambda[idx] = new_lambda
+        iterations[idx] += 1
+        active[idx[converged]] = False
+
+    # 3) Contrôle : M - lambda V Vt garde les autres valeurs propres, que sa norme de Frobenius
+    #    majore. Si elle dépasse lambda (ou sans convergence), on repasse par eigh
+    residual = np_M - _lambda[:, None, None] * outer_products(V)
+    doubtful = ~degenerate & (active | (np.linalg.norm(residual, axis=(1, 2)) > np.abs(_lambda) * (1 + 1e-9)))
+    if np.any(doubtful):
+        eigenvalues, eigenvectors = np.linalg.eigh(np_M[doubtful])
+        _lambda[doubtful], V[doubtful] = eigenvalues[:, -1], eigenvectors[:, :, -1]
+
+    # 4) On retourne le plus grand lambda, V et le nombre d'itérations
+    return _lambda, orient_axes(V), iterations
+
+
+def power_method(M: list, num_simulations: int = 10, tolerance: float = 1e-12) -> tuple:
+    eigenvalues, eigenvectors, _ = power_iteration(M, num_simulations, tolerance)
+
+    return eigenvalues[0], eigenvectors[0]
+
+
+def compute_principal_axes(covMatrices, solver: str = 'EIGH', max_iterations: int = 100, tolerance: float = 1e-12) -> tuple:
+    """Dominant eigenvalue, eigenvector and iteration count of one or many 3x3 covariance matrices"""
+    covMatrices = np.asarray(covMatrices, dtype=np.float64).reshape(-1, 3, 3)
+
+    if solver == 'EIGH':
+        # eigh trie les valeurs propres par ordre croissant : l'axe principal est la dernière colonne
+        eigenvalues, eigenvectors = np.linalg.eigh(covMatrices)
+        return eigenvalues[:, -1], orient_axes(eigenvectors[:, :, -1]), np.zeros(len(covMatrices), dtype=np.intp)
+    elif solver == 'POWER':
+        return power_iteration(covMatrices, max_iterations, tolerance)
+    else:
+        raise ValueError(f"Unknown eigen solver {solver}")
+
+
+def compute_extremities(center_points_cloud, eigenvector, trim: float = 0.0) -> np.ndarray:
+    """Both extremities, along an unit axis, of a centered points cloud as a (2, 3) array"""
+    # Coordonnée signée de chaque point : un seul produit matrice-vecteur
+    proj = as_points_cloud(center_points_cloud) @ eigenvector
+
+    return np.outer(projection_bounds(proj, trim), eigenvector)
+
+
+def projection_bounds(proj, trim: float = 0.0) -> tuple:
+    """Smallest and largest projection, ignoring `trim` percent of the points at each end (stray points)"""
+    k = int(trim / 100 * (len(proj) - 1))
+    if k > 0:
+        return tuple(np.partition(proj, (k, len(proj) - 1 - k))[[k, len(proj) - 1 - k]])
+
+    return proj.min(), proj.max()
+
+
+def orient_axes(axes) -> np.ndarray:
+    """Helper to give eigenvectors a deterministic sign (largest component positive)"""
+    axes = np.asarray(axes, dtype=np.float64)
+    dominant = np.take_along_axis(axes, np.abs(axes).argmax(axis=-1)[..., None], axis=-1)
+
+    return np.where(dominant < 0, -axes, axes)
 
-    # 1) On choisit un vecteur initial
-    V = np.array([0, 0, 1])
-    _lambda = 0
 
-    # 2) Pour k de 0, 1, 2 ...
-    for k in range(num_simulations):
-        V_normalized = V / np.linalg.norm(V)  # On normalise V
+def concatenate_members(members: dict) -> tuple:
+    """Helper to flatten a dict of points clouds into (keys, points, labels)"""
+    keys = list(members.keys())
+    clouds = [as_points_cloud(points_cloud) for points_cloud in members.values()]
 
-        # a) On calcule M . Vk
-        M_dot_V = np_M.dot(V_normalized)
+    points = np.concatenate(clouds) if clouds else np.empty((0, 3))
+    labels = np.repeat(np.arange(len(clouds)), [len(cloud) for cloud in clouds])
 
-        # b) On trouve la plus grande valeur absolu de M . Vk
-        _lambda = max(M_dot_V.tolist(), key=lambda x: abs(x)) 
+    return keys, points, labels
 
-        # c) On calcule V(k + 1)
-        V = (1 / _lambda) * M_dot_V
 
-    # 3) On retourne le k plus grand lambda et V
-    return _lambda, V
+def segment_members(points, labels, count: int = None) -> tuple:
+    """Helper to make the points of every member contiguous, as (points, bounds of the members)"""
+    points = as_points_cloud(points)
+    labels = np.asarray(labels, dtype=np.intp)
+
+    if count is None:
+        count = int(labels.max()) + 1 if len(labels) else 0
+
+    # Déjà le cas pour un nuage concaténé : sinon, un seul tri stable
+    if np.any(labels[1:] < labels[:-1]):
+        points = points[np.argsort(labels, kind='stable')]
+
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=count))])
+    return points, bounds
+
+
+def compute_segmented_statistics(points, labels, count: int = None) -> tuple:
+    """Compute the barycenter and covariance matrix of every member at once"""
+    return contiguous_statistics(*segment_members(points, labels, count))
+
+
+def contiguous_statistics(points, bounds) -> tuple:
+    """compute_segmented_statistics for members already contiguous, between `bounds`"""
+    sizes = np.diff(bounds)
+    nonempty = np.flatnonzero(sizes)
+
+    # a) Barycentres : une seule somme segmentée sur les points contigus
+    barycenters = np.zeros((len(sizes), 3))
+    if len(nonempty):
+        barycenters[nonempty] = np.add.reduceat(points, bounds[nonempty], axis=0) / sizes[nonempty, None]
+
+    # b) Covariances : un produit matriciel (BLAS) par tranche, sans copie des points ni des labels
+    covMatrices = np.zeros((len(sizes), 3, 3))
+    for idx in nonempty:
+        centered = points[bounds[idx]:bounds[idx + 1]] - barycenters[idx]
+        covMatrices[idx] = centered.T @ centered
+    covMatrices /= np.maximum(sizes - 1, 1)[:, None, None]
+
+    return barycenters, covMatrices, sizes
+
+
+def compute_bones_generation_segmented(points, labels, keys: list, trim: float = 0.0, **solver_options) -> dict:
+    """Same result as compute_bones_generation, for a labelled points cloud in a single pass"""
+    points, bounds = segment_members(points, labels, len(keys))
+
+    # ----- STEP 1 -----
+    barycenters, covMatrices, sizes = contiguous_statistics(points, bounds)
+
+    # ----- STEP 2 -----
+    _, axes, _ = compute_principal_axes(covMatrices, **solver_options)
+
+    # ----- STEP 3 & 4 -----
+    principal_components = {}
+    for idx in np.flatnonzero(sizes):
+        # Coordonnée signée des points sur l'axe : projection des points bruts, décalée du barycentre
+        proj = points[bounds[idx]:bounds[idx + 1]] @ axes[idx] - barycenters[idx] @ axes[idx]
+        low, high = projection_bounds(proj, trim)
+
+        principal_components[keys[idx]] = (barycenters[idx] + np.outer([low, high], axes[idx])).tolist()  # to world space
+
+    return principal_components
 
 
 def inv(point: tuple) -> tuple:
     return (-point[0], -point[1], -point[2])
 
 
-def compute_bones_generation(object, members: dict) -> dict:
+# -------------------------------------------------------------------
+# Étape de réduction : l'axe principal d'un membre est estimé sur un
+# sous-ensemble de ses points, ses extrémités restent celles de toutes
+# les données (un min/max par paquets sur la projection).
+
+
+def reduce_points(points, method: str = 'RANDOM', size: int = 10000, weights=None, seed: int = 0) -> np.ndarray:
+    """At most about `size` points representative of a points cloud.
+
+    RANDOM draws uniformly, AREA draws proportionally to `weights` (the area around
+    every vertex), VOXEL keeps the centroid of every occupied cell of a regular grid.
+    """
+    points = as_points_cloud(points)
+    if method == 'NONE' or len(points) <= size:
+        return points
+
+    rng = np.random.default_rng(seed)
+
+    if method == 'RANDOM':
+        return points[rng.choice(len(points), size, replace=False)]
+    elif method == 'AREA':
+        if weights is None:
+            return reduce_points(points, 'RANDOM', size, seed=seed)
+        p = np.asarray(weights, dtype=np.float64)
+        nonzero = np.count_nonzero(p)
+        if nonzero == 0:
+            return reduce_points(points, 'RANDOM', size, seed=seed)
+        # Sans remise : pas plus de tirages que de sommets d'aire non nulle (membres fins ou dégénérés)
+        return points[rng.choice(len(points), min(size, nonzero), replace=False, p=p / p.sum())]
+    elif method == 'VOXEL':
+        return voxel_downsample(points, size, seed=seed)
+    else:
+        raise ValueError(f"Unknown reduction method {method}")
+
+
+def voxel_cells(points, low, edge) -> tuple:
+    """Cell of every point in a grid of cubes of side `edge` starting at `low`, as (inverse, count)"""
+    cells = np.floor((points - low) / edge).astype(np.int64)
+    dims = cells.max(axis=0) + 1
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+    if np.prod(dims) <= max(4 * len(points), 1 << 22):
+        # Grille assez petite : numérotation des cellules occupées sans tri
+        occupied = np.bincount(keys, minlength=np.prod(dims)) > 0
+        numbers = np.cumsum(occupied) - 1
+        return numbers[keys], int(numbers[-1]) + 1
+
+    _, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    return inverse, int(inverse.max()) + 1
+
+
+def voxel_downsample(points, size: int, max_iterations: int = 4, seed: int = 0) -> np.ndarray:
+    """Centroids of the occupied cells of a grid sized to keep about `size` of them"""
+    low = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - low, 1e-9)
+    # Taille de cellule initiale pour un volume plein, ajustée ensuite au nombre de cellules occupées
+    edge = (np.prod(extent) / size) ** (1 / 3)
+
+    # L'ajustement se fait sur un échantillon, assez dense pour occuper les mêmes cellules
+    rng = np.random.default_rng(seed)
+    sample = points if len(points) <= 8 * size else points[rng.choice(len(points), 8 * size, replace=False)]
+    for _ in range(max_iterations):
+        _, occupied = voxel_cells(sample, low, edge)
+        if 0.5 * size <= occupied <= size:
+            break
+        # Une surface occupe un nombre de cellules en 1 / edge²
+        edge *= np.sqrt(occupied / size)
+
+    inverse, occupied = voxel_cells(points, low, edge)
+    counts = np.bincount(inverse, minlength=occupied)
+    return np.stack([np.bincount(inverse, weights=points[:, j], minlength=occupied) for j in range(3)], axis=1) / counts[:, None]
+
+
+def reduce_members(members: dict, method: str = 'RANDOM', size: int = 10000, weights: dict = None) -> dict:
+    weights = weights or {}
+    return {
+        key: reduce_points(points_cloud, method, size, weights.get(key)) for key, points_cloud in members.items()
+    }
+
+
+def projection_extremes(points, origin, axis, trim: float = 0.0, chunk_size: int = 65536) -> tuple:
+    """Smallest and largest projection of the points on the line (origin, axis), by chunks"""
+    points = as_points_cloud(points)
+    origin = np.asarray(origin, dtype=np.float64)
+
+    if trim > 0:
+        # Les quantiles demandent toute la projection
+        return projection_bounds((points - origin) @ axis, trim)
+
+    low, high = np.inf, -np.inf
+    for start in range(0, len(points), chunk_size):
+        proj = (points[start:start + chunk_size] - origin) @ axis
+        low, high = min(low, proj.min()), max(high, proj.max())
+
+    return low, high
+
+
+def extend_extremities(principal_components: dict, members: dict, trim: float = 0.0) -> dict:
+    """Move the extremities of every member to the ends of all its points along its axis"""
+    extended = {}
+
+    for key, (low, high) in principal_components.items():
+        low, high = np.asarray(low), np.asarray(high)
+        length = np.linalg.norm(high - low)
+        if length == 0:
+            extended[key] = [low.tolist(), high.tolist()]
+            continue
+
+        axis = (high - low) / length
+        bounds = projection_extremes(members[key], low, axis, trim)
+        extended[key] = (low + np.outer(bounds, axis)).tolist()
+
+    return extended
+
+
+def reduction_angular_errors(members: dict, method: str = 'RANDOM', size: int = 10000, weights: dict = None,
+                             **solver_options) -> dict:
+    """Angle in degrees between the axis of every member and the one of its reduced points cloud"""
+    errors = {}
+
+    for key, points_cloud in members.items():
+        if len(as_points_cloud(points_cloud)) == 0:
+            continue
+        reduced = reduce_points(points_cloud, method, size, (weights or {}).get(key))
+        covMatrices = [compute_covmatrix(transform_space(compute_barycenter(cloud), cloud), length=3)
+                       for cloud in (as_points_cloud(points_cloud), reduced)]
+        _, axes, _ = compute_principal_axes(covMatrices, **solver_options)
+
+        # Un axe n'a pas de sens : |cos|
+        errors[key] = float(np.degrees(np.arccos(np.clip(abs(axes[0] @ axes[1]), 0, 1))))
+
+    return errors
+
+
+def compute_bones_generation(object, members: dict, trim: float = 0.0, reduction: str = 'NONE',
+                             sample_size: int = 10000, weights: dict = None, **solver_options) -> dict:
+    if reduction != 'NONE':
+        # Axes sur les points réduits, extrémités sur tous les points
+        principal_components = compute_bones_generation(
+            object, reduce_members(members, reduction, sample_size, weights), trim, **solver_options
+        )
+        return extend_extremities(principal_components, members, trim)
+
     principal_components = {}
 
     # Pour tout les membres
     for key, points_cloud in members.items():
+        points_cloud = as_points_cloud(points_cloud)
+        if len(points_cloud) == 0:
+            continue  # membre vide, ignoré comme dans les autres chemins
 
         # ----- STEP 1 -----
 
@@ -99,27 +383,637 @@ def compute_bones_generation(object, members: dict) -> dict:
         # ----- STEP 2 -----
 
         # d) On calcule les valeurs propres (eigenvalue), et les vecteurs propres (eigenvector)
-        eigenvalue, eigenvector = power_method(covMatrix, 100)  # eigendecomposition of covariance matrix
-        print(f"eigenvalue: {eigenvalue} | eigenvector: {eigenvector}")
+        eigenvalues, eigenvectors, iterations = compute_principal_axes(covMatrix, **solver_options)
+        eigenvalue, eigenvector = eigenvalues[0], eigenvectors[0]
+        print(f"eigenvalue: {eigenvalue} | eigenvector: {eigenvector} | iterations: {iterations[0]}")
 
         # ----- STEP 3 -----
 
         # e) On projete les données centrées sur l'eigenvector
-        norm = np.linalg.norm(eigenvector)  # finding norm of the eigenvector
-        proj = [
-            ((np.dot(point, eigenvector) / (norm * norm)) * eigenvector).tolist() for point in center_points_cloud
-        ]
-        # f) On récupère les deux extrémitées
-        center_pc = [
-            max(proj, key=lambda x: np.linalg.norm(x)),
-            min(proj, key=lambda x: np.linalg.norm(x))
-        ]
+        # f) On récupère les deux extrémitées (plus petite et plus grande coordonnée signée)
+        center_pc = compute_extremities(center_points_cloud, eigenvector, trim)
 
         # ----- STEP 4 -----
 
         # g) On repositionne les deux points
-        pc = transform_space(inv(barycenter), center_pc)  # to world space
+        pc = transform_space(inv(barycenter), center_pc).tolist()  # to world space
 
         principal_components[key] = pc
 
     return principal_components
+
+
+class PrincipalComponentsCache:
+    """Principal components of the members, keyed by a content hash of their points and of the generation options"""
+
+    def __init__(self):
+        self._entries = {}
+
+    @staticmethod
+    def make_key(points_cloud, options: dict) -> str:
+        points = np.ascontiguousarray(as_points_cloud(points_cloud), dtype=np.float32)
+
+        digest = hashlib.blake2b(points.tobytes(), digest_size=16)
+        digest.update(repr(sorted(options.items())).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, name: str, key: str):
+        entry = self._entries.get(name)
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1]
+
+    def set(self, name: str, key: str, value):
+        self._entries[name] = (key, value)
+
+    @staticmethod
+    def chain_name(name: str) -> str:
+        """Entry of the chain of bones of a member"""
+        return f"{name}.chain"
+
+    def invalidate(self, name: str = None):
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+            self._entries.pop(self.chain_name(name), None)
+
+
+def compute_bones_generation_from_moments(members: dict, moments: dict, trim: float = 0.0, **solver_options) -> dict:
+    """compute_bones_generation for members whose moments are known : only the extremities read the points"""
+    keys = [key for key in members if moments[key].count > 0]
+    if not keys:
+        return {}
+
+    _, axes, _ = compute_principal_axes([moments[key].covariance() for key in keys], **solver_options)
+
+    principal_components = {}
+    for key, axis in zip(keys, axes):
+        barycenter = moments[key].mean
+        bounds = projection_extremes(members[key], barycenter, axis, trim)
+        principal_components[key] = (barycenter + np.outer(bounds, axis)).tolist()
+
+    return principal_components
+
+
+def compute_bones_generation_cached(cache: PrincipalComponentsCache, members: dict, single_pass: bool = True,
+                                    weights: dict = None, moments: dict = None, **options) -> dict:
+    """compute_bones_generation which only recomputes the members missing from `cache`.
+
+    The axis of the members of `moments` (see `Moments`) comes from their stored moments, without
+    any reduction nor covariance pass.
+    """
+    keys = {name: cache.make_key(points_cloud, options) for name, points_cloud in members.items()}
+    changed = {name: points_cloud for name, points_cloud in members.items() if cache.get(name, keys[name]) is None}
+
+    known = {name: changed.pop(name) for name in list(changed) if name in (moments or {})}
+    if known:
+        solver_options = {key: value for key, value in options.items() if key not in ('trim', 'reduction', 'sample_size')}
+        principal_components = compute_bones_generation_from_moments(
+            known, moments, options.get('trim', 0.0), **solver_options
+        )
+        for name in known:
+            cache.set(name, keys[name], principal_components.get(name))
+
+    if changed:
+        if single_pass:
+            options = dict(options)
+            reduction, sample_size = options.pop('reduction', 'NONE'), options.pop('sample_size', 10000)
+            clouds = changed if reduction == 'NONE' else reduce_members(changed, reduction, sample_size, weights)
+
+            names, points, labels = concatenate_members(clouds)
+            principal_components = compute_bones_generation_segmented(points, labels, names, **options)
+
+            if reduction != 'NONE':
+                principal_components = extend_extremities(principal_components, changed, options.get('trim', 0.0))
+        else:
+            principal_components = compute_bones_generation(None, changed, weights=weights, **options)
+
+        for name in changed:
+            cache.set(name, keys[name], principal_components.get(name))
+
+    return {
+        name: cache.get(name, keys[name]) for name in members if cache.get(name, keys[name]) is not None
+    }
+
+# -------------------------------------------------------------------
+# Moments d'un nuage de points (effectif, moyenne, co-moment) : le seul
+# type utilisé par les membres (ajouter ou retirer k points coûte O(k)),
+# le chemin en flux (fusion des paquets à la Chan) et les chaînes d'os
+# (sommes préfixes d'intervalles). Un objet peut porter un lot de
+# nuages : les champs ont alors une dimension de plus en tête.
+
+
+def outer_products(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors)
+    return vectors[..., :, None] * vectors[..., None, :]
+
+
+class Moments:
+    """Mergeable count, mean and co-moment (sum of centered outer products) of one or many points clouds"""
+
+    SIZE = 10  # packed: count (1), mean (3), co-moment (6 unique terms)
+
+    def __init__(self, count=0, mean=None, comoment=None):
+        self.count = np.asarray(count, dtype=np.float64)
+        self.mean = np.zeros(self.count.shape + (3,)) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.comoment = np.zeros(self.count.shape + (3, 3)) if comoment is None else np.asarray(comoment, dtype=np.float64)
+
+    @classmethod
+    def of(cls, points) -> 'Moments':
+        points = as_points_cloud(points)
+        if len(points) == 0:
+            return cls()
+        mean = points.mean(axis=0)
+        centered = points - mean
+        return cls(len(points), mean, centered.T @ centered)
+
+    @classmethod
+    def of_intervals(cls, points, bounds) -> 'Moments':
+        """Moments of the consecutive intervals [bounds[i], bounds[i + 1]) covering `points`"""
+        points = as_points_cloud(points)
+        bounds = np.asarray(bounds, dtype=np.intp)
+        counts = np.diff(bounds)
+        nonempty = counts > 0
+
+        mean = np.zeros((len(counts), 3))
+        comoment = np.zeros((len(counts), 3, 3))
+        if np.any(nonempty):
+            starts = bounds[:-1][nonempty]
+            mean[nonempty] = np.add.reduceat(points, starts, axis=0) / counts[nonempty, None]
+            centered = points - np.repeat(mean, counts, axis=0)
+            for i, j in SYMMETRIC_TERMS:
+                comoment[nonempty, i, j] = comoment[nonempty, j, i] = np.add.reduceat(centered[:, i] * centered[:, j], starts)
+
+        return cls(counts, mean, comoment)
+
+    @classmethod
+    def from_array(cls, array) -> 'Moments':
+        array = np.asarray(array, dtype=np.float64)
+        comoment = np.empty((3, 3))
+        for t, (i, j) in enumerate(SYMMETRIC_TERMS):
+            comoment[i, j] = comoment[j, i] = array[4 + t]
+        return cls(array[0], array[1:4], comoment)
+
+    def to_array(self) -> np.ndarray:
+        return np.concatenate([[self.count], self.mean, [self.comoment[i, j] for i, j in SYMMETRIC_TERMS]])
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def __getitem__(self, index) -> 'Moments':
+        return Moments(self.count[index], self.mean[index], self.comoment[index])
+
+    def merge(self, other: 'Moments') -> 'Moments':
+        """Chan et al. pairwise update, exact whatever the sizes of both parts"""
+        count = self.count + other.count
+        share = other.count / np.maximum(count, 1)
+        delta = other.mean - self.mean
+
+        mean = self.mean + delta * share[..., None]
+        comoment = self.comoment + other.comoment + outer_products(delta) * (self.count * share)[..., None, None]
+        return Moments(count, mean, comoment)
+
+    def subtract(self, other: 'Moments') -> 'Moments':
+        """Moments of what remains once the part `other` is taken out (inverse of `merge`)"""
+        count = self.count - other.count
+        mean = (self.count[..., None] * self.mean - other.count[..., None] * other.mean) / np.maximum(count, 1)[..., None]
+        mean = np.where(count[..., None] > 0, mean, 0)
+        delta = other.mean - mean
+
+        comoment = self.comoment - other.comoment - outer_products(delta) * (
+            count * other.count / np.maximum(self.count, 1))[..., None, None]
+        return Moments(count, mean, comoment)
+
+    def add(self, points) -> 'Moments':
+        return self.merge(Moments.of(points))
+
+    def remove(self, points) -> 'Moments':
+        return self.subtract(Moments.of(points))
+
+    def prefix(self) -> 'Moments':
+        """Moments of the first 0, 1, ..., n parts of a batch"""
+        count = np.zeros(len(self) + 1)
+        mean = np.zeros((len(self) + 1, 3))
+        comoment = np.zeros((len(self) + 1, 3, 3))
+
+        total = Moments()
+        for k in range(len(self)):
+            total = total.merge(self[k])
+            count[k + 1], mean[k + 1], comoment[k + 1] = total.count, total.mean, total.comoment
+
+        return Moments(count, mean, comoment)
+
+    def covariance(self) -> np.ndarray:
+        return self.comoment / np.maximum(self.count - 1, 1)[..., None, None]
+
+    def principal_axis(self, **solver_options) -> np.ndarray:
+        _, axes, _ = compute_principal_axes(self.covariance(), **solver_options)
+        return axes[0]
+
+# -------------------------------------------------------------------
+# Chemin en flux : un membre est une suite de paquets de points (tranches
+# d'un fichier .bgen mappé en mémoire, d'un tableau, ou tout itérable),
+# jamais matérialisé en entier. Une première passe fusionne les moments
+# de chaque paquet, une seconde cherche les extrémités de la projection.
+# La mémoire reste bornée par la taille d'un paquet.
+
+
+def iter_chunks(source, chunk_size: int = 65536):
+    """Chunks of (n, 3) points of a member : an array (or memmap) is sliced, a callable returns a new iterable"""
+    if callable(source):
+        for chunk in source():
+            yield as_points_cloud(chunk)
+        return
+
+    points = np.asarray(source).reshape(-1, 3)
+    for start in range(0, len(points), chunk_size):
+        yield points[start:start + chunk_size].astype(np.float64)
+
+
+def streaming_moments(source, chunk_size: int = 65536) -> Moments:
+    moments = Moments()
+    for chunk in iter_chunks(source, chunk_size):
+        moments = moments.merge(Moments.of(chunk))
+    return moments
+
+
+def streaming_projection_bounds(source, origin, axis, trim: float = 0.0, count: int = None,
+                                chunk_size: int = 65536, bins: int = 4096) -> tuple:
+    """Smallest and largest projection on (origin, axis) of a chunked member.
+
+    With `trim`, the two order statistics are found exactly with a histogram pass
+    followed by a pass gathering only the values of the two bins holding them.
+    """
+    low, high, total = np.inf, -np.inf, 0
+    for chunk in iter_chunks(source, chunk_size):
+        if len(chunk):
+            proj = (chunk - origin) @ axis
+            low, high, total = min(low, proj.min()), max(high, proj.max()), total + len(proj)
+
+    count = total if count is None else count
+    k = int(trim / 100 * (count - 1))
+    if k <= 0 or high <= low:
+        return low, high
+
+    # Rangs cherchés : k et count - 1 - k
+    def cells(proj):
+        return np.clip(((proj - low) * (bins / (high - low))).astype(np.int64), 0, bins - 1)
+
+    histogram = np.zeros(bins, dtype=np.int64)
+    for chunk in iter_chunks(source, chunk_size):
+        histogram += np.bincount(cells((chunk - origin) @ axis), minlength=bins)
+
+    cumulative = np.cumsum(histogram)
+    ranks = (k, count - 1 - k)
+    wanted = [int(np.searchsorted(cumulative, rank, side='right')) for rank in ranks]
+
+    gathered = [[], []]
+    for chunk in iter_chunks(source, chunk_size):
+        proj = (chunk - origin) @ axis
+        proj_cells = cells(proj)
+        for i, cell in enumerate(wanted):
+            gathered[i].append(proj[proj_cells == cell])
+
+    bounds = []
+    for i, (rank, cell) in enumerate(zip(ranks, wanted)):
+        values = np.sort(np.concatenate(gathered[i]))
+        before = cumulative[cell - 1] if cell > 0 else 0
+        bounds.append(values[rank - before])
+
+    return tuple(bounds)
+
+
+def compute_bones_generation_streaming(members: dict, trim: float = 0.0, chunk_size: int = 65536,
+                                       **solver_options) -> dict:
+    """compute_bones_generation for members given as chunk sources (see `iter_chunks`)"""
+    principal_components = {}
+
+    for key, source in members.items():
+        # ----- STEP 1 -----
+        moments = streaming_moments(source, chunk_size)
+        if moments.count == 0:
+            continue
+
+        # ----- STEP 2 -----
+        _, axes, _ = compute_principal_axes(moments.covariance(), **solver_options)
+
+        # ----- STEP 3 -----
+        bounds = streaming_projection_bounds(source, moments.mean, axes[0], trim, int(moments.count), chunk_size)
+
+        # ----- STEP 4 -----
+        principal_components[key] = (moments.mean + np.outer(bounds, axes[0])).tolist()
+
+    return principal_components
+
+# -------------------------------------------------------------------
+# Chaînes d'os : un membre est découpé le long de son axe principal en
+# segments ajustés chacun par une ACP. Les points sont triés une seule
+# fois par projection, les moments de chaque intervalle candidat sont
+# cumulés : les moments de n'importe quel segment [a, b) sont alors une
+# différence de deux préfixes, sans repasser sur les points.
+
+def split_segments(prefix: Moments, count: int) -> list:
+    """Boundaries (in candidate intervals) of the `count` segments of smallest total residual"""
+    candidates = len(prefix) - 1
+    a, b = np.triu_indices(candidates + 1, k=1)
+    segments = prefix[b].subtract(prefix[a])
+
+    # Résidu d'un segment : distance carrée des points à sa droite = trace - plus grande valeur propre
+    residuals = np.full((candidates + 1, candidates + 1), np.inf)
+    residuals[a, b] = np.where(
+        segments.count >= 2,
+        np.trace(segments.comoment, axis1=-2, axis2=-1) - np.linalg.eigvalsh(segments.comoment)[:, -1],
+        np.inf,
+    )
+
+    # Programmation dynamique : best[j, e] = meilleur résidu de j segments couvrant [0, e)
+    best = np.full((count + 1, candidates + 1), np.inf)
+    previous = np.zeros((count + 1, candidates + 1), dtype=np.intp)
+    best[0, 0] = 0
+    for j in range(1, count + 1):
+        totals = best[j - 1][:, None] + residuals
+        previous[j] = np.argmin(totals, axis=0)
+        best[j] = totals[previous[j], np.arange(candidates + 1)]
+
+    if not np.isfinite(best[count, candidates]):
+        return list(np.linspace(0, candidates, count + 1).round().astype(np.intp))
+
+    bounds = [candidates]
+    for j in range(count, 0, -1):
+        bounds.append(previous[j, bounds[-1]])
+    return bounds[::-1]
+
+
+def compute_chain(points_cloud, count: int, method: str = 'UNIFORM', trim: float = 0.0, candidates: int = 64,
+                  **solver_options) -> list:
+    """Joints of a chain of `count` bones fitted along the principal axis of a member.
+
+    UNIFORM splits the member in segments of equal length, ADAPTIVE picks the splits among
+    `candidates` positions to minimize the distance of the points to their segment. `trim`
+    percent of the points of the member are ignored at both ends of the chain.
+    """
+    points = as_points_cloud(points_cloud)
+    origin = points.mean(axis=0)
+    centered = points - origin
+
+    _, axes, _ = compute_principal_axes(compute_covmatrix(centered, length=3), **solver_options)
+    axis = axes[0]
+
+    # Un seul tri des points selon leur projection
+    proj = centered @ axis
+    order = np.argsort(proj, kind='stable')
+    proj, centered = proj[order], centered[order]
+
+    intervals = count if method == 'UNIFORM' else max(candidates, count)
+    bounds = np.searchsorted(proj, np.linspace(proj[0], proj[-1], intervals + 1)[1:-1])
+    bounds = np.concatenate([[0], bounds, [len(proj)]])
+    prefix = Moments.of_intervals(centered, bounds).prefix()
+
+    splits = np.arange(count + 1) if method == 'UNIFORM' else np.asarray(split_segments(prefix, count))
+
+    # Une ACP par segment, toutes en même temps
+    segments = prefix[splits[1:]].subtract(prefix[splits[:-1]])
+    means = segments.mean
+    _, segment_axes, _ = compute_principal_axes(segments.covariance(), **solver_options)
+    segment_axes *= np.where(segment_axes @ axis < 0, -1, 1)[:, None]
+
+    # Extrémités de chaque segment sur son propre axe
+    ends = []
+    for idx, (start, end) in enumerate(zip(bounds[splits[:-1]], bounds[splits[1:]])):
+        if end - start < 2:
+            # Segment vide : on reste sur l'axe du membre
+            ends.append(np.outer(proj[[min(start, len(proj) - 1), max(end - 1, 0)]], axis))
+            continue
+        segment_proj = (centered[start:end] - means[idx]) @ segment_axes[idx]
+        low, high = segment_proj.min(), segment_proj.max()
+
+        # Les points ignorés le sont aux deux bouts du membre : même nombre de points,
+        # exprimé en pourcentage du segment qui porte ce bout
+        if trim > 0 and idx in (0, count - 1):
+            segment_trim = min(trim * (len(proj) - 1) / (end - start - 1), 49.0)
+            trimmed = projection_bounds(segment_proj, segment_trim)
+            low = trimmed[0] if idx == 0 else low
+            high = trimmed[1] if idx == count - 1 else high
+
+        ends.append(means[idx] + np.outer([low, high], segment_axes[idx]))
+
+    # Une articulation entre deux segments est au milieu de leurs extrémités voisines
+    joints = [ends[0][0]] + [(ends[i][1] + ends[i + 1][0]) / 2 for i in range(count - 1)] + [ends[-1][1]]
+
+    return (np.asarray(joints) + origin).tolist()
+
+
+def compute_chains(members: dict, counts: dict, method: str = 'UNIFORM', trim: float = 0.0, **solver_options) -> dict:
+    """Joints of the chain of every member of `counts` with more than one bone"""
+    return {
+        key: compute_chain(members[key], count, method, trim, **solver_options)
+        for key, count in counts.items() if count > 1 and key in members and len(as_points_cloud(members[key])) > count
+    }
+
+
+def compute_chains_cached(cache: 'PrincipalComponentsCache', members: dict, counts: dict, method: str = 'UNIFORM',
+                          trim: float = 0.0, **solver_options) -> dict:
+    """compute_chains which only refits the chains missing from `cache` (next to the principal components)"""
+    options = dict(solver_options, trim=trim, chain_bones=None, chain_split=method)
+    chains = {}
+
+    for key, count in counts.items():
+        if key not in members:
+            continue
+
+        name = cache.chain_name(key)
+        options['chain_bones'] = count
+        cache_key = cache.make_key(members[key], options)
+
+        joints = cache.get(name, cache_key)
+        if joints is None:
+            joints = compute_chains({key: members[key]}, {key: count}, method, trim, **solver_options).get(key)
+            cache.set(name, cache_key, joints)
+        if joints is not None:
+            chains[key] = joints
+
+    return chains
+
+# -------------------------------------------------------------------
+# Skinning from the members : the vertices of a member belong to its
+# bone, the other ones are shared between their nearest bones.
+
+
+def segment_distances(points, heads, tails) -> np.ndarray:
+    """(N, B) distances of every point to every bone segment [head, tail]"""
+    points = as_points_cloud(points)
+    heads = as_points_cloud(heads)
+    segments = as_points_cloud(tails) - heads
+
+    length2 = np.einsum('ij,ij->i', segments, segments)
+    length2[length2 == 0] = 1
+
+    # Paramètre de la projection de chaque point sur chaque segment, borné à [0, 1]
+    relative = points[:, None, :] - heads[None, :, :]
+    t = np.clip(np.einsum('nbj,bj->nb', relative, segments) / length2, 0, 1)
+
+    return np.linalg.norm(relative - t[..., None] * segments[None, :, :], axis=-1)
+
+
+def compute_skin_weights(points, heads, tails, assignment, influences: int = 2,
+                         power: float = 2.0, chunk_size: int = 65536) -> list:
+    """(vertex indices, weights) of every bone.
+
+    `assignment` holds the bone of every point, or -1 for the points of no member :
+    those get an inverse distance falloff over their `influences` nearest bones.
+    """
+    points = as_points_cloud(points)
+    assignment = np.asarray(assignment, dtype=np.int64)
+    count = len(as_points_cloud(heads))
+    influences = min(influences, count)
+
+    free = np.flatnonzero(assignment < 0)
+    free_bones = np.empty((len(free), influences), dtype=np.int64)
+    free_weights = np.empty((len(free), influences), dtype=np.float64)
+
+    # Par paquets, la matrice des distances (N, B) n'est jamais entière en mémoire
+    for start in range(0, len(free), chunk_size):
+        chunk = free[start:start + chunk_size]
+        distances = segment_distances(points[chunk], heads, tails)
+
+        nearest = np.argpartition(distances, influences - 1, axis=1)[:, :influences]
+        weights = 1.0 / (np.take_along_axis(distances, nearest, axis=1) + 1e-6) ** power
+
+        free_bones[start:start + len(chunk)] = nearest
+        free_weights[start:start + len(chunk)] = weights / weights.sum(axis=1, keepdims=True)
+
+    assigned = np.flatnonzero(assignment >= 0)
+    bones = np.concatenate([assignment[assigned], free_bones.ravel()])
+    indices = np.concatenate([assigned, np.repeat(free, influences)])
+    weights = np.concatenate([np.ones(len(assigned)), free_weights.ravel()])
+
+    # Regroupement par os sans boucle sur les sommets
+    order = np.argsort(bones, kind='stable')
+    bounds = np.searchsorted(bones[order], np.arange(count + 1))
+
+    return [
+        (indices[order[bounds[b]:bounds[b + 1]]], weights[order[bounds[b]:bounds[b + 1]]]) for b in range(count)
+    ]
+
+# -------------------------------------------------------------------
+# Segmentation automatique en membres : mini-batch k-means sur un
+# sous-échantillon, initialisé depuis la boîte englobante (personnage
+# debout selon Z, bras écartés le long de X) et gardé symétrique
+# par rapport au plan médian X = centre.
+
+# Graines en fractions de la boîte englobante (x relatif au centre, z depuis le bas),
+# le côté gauche du personnage est du côté des X négatifs (voir examples/)
+SEGMENT_SEEDS = {
+    'HEAD': (0.0, 0.92),
+    'BODY': (0.0, 0.65),
+    'LEFT ARM': (-0.4, 0.55),
+    'RIGHT ARM': (0.4, 0.55),
+    'LEFT LEG': (-0.15, 0.22),
+    'RIGHT LEG': (0.15, 0.22),
+}
+SYMMETRIC_SEGMENTS = [('LEFT ARM', 'RIGHT ARM'), ('LEFT LEG', 'RIGHT LEG')]
+
+
+def nearest_centroids(points, centroids, variances=None, weights=None, chunk_size: int = 65536) -> np.ndarray:
+    """Index of the nearest centroid of every point, by chunks of `chunk_size` points.
+
+    With `variances` (and `weights`), the distance is the negative log-likelihood of
+    axis aligned gaussians, elongated members then keep their ends.
+    """
+    points = as_points_cloud(points)
+    labels = np.empty(len(points), dtype=np.int64)
+
+    if variances is None:
+        scales = np.ones_like(centroids)
+        offsets = np.zeros(len(centroids))
+    else:
+        scales = 1.0 / variances
+        offsets = np.log(variances).sum(axis=1) - 2 * np.log(np.maximum(weights, 1e-12))
+    offsets = offsets + np.einsum('ij,ij->i', centroids * scales, centroids)
+
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        # sum((p - c)² / v) = p².(1/v) - 2 p.(c/v) + c².(1/v)
+        distances = (chunk * chunk) @ scales.T - 2 * chunk @ (centroids * scales).T + offsets
+        labels[start:start + len(chunk)] = np.argmin(distances, axis=1)
+
+    return labels
+
+
+def symmetrize_centroids(centroids, keys: list, center_x: float, variances=None):
+    """Mirror the pairs of centroids about the plane X = `center_x`, keep the others on it"""
+    paired = set()
+    for left, right in SYMMETRIC_SEGMENTS:
+        i, j = keys.index(left), keys.index(right)
+        mirrored = centroids[j].copy()
+        mirrored[0] = 2 * center_x - mirrored[0]
+
+        centroids[i] = (centroids[i] + mirrored) / 2
+        centroids[j] = centroids[i]
+        centroids[j, 0] = 2 * center_x - centroids[i, 0]
+        if variances is not None:
+            variances[i] = variances[j] = (variances[i] + variances[j]) / 2
+        paired.update((i, j))
+
+    for i in range(len(keys)):
+        if i not in paired:
+            centroids[i, 0] = center_x
+
+
+def auto_segment(points, sample_size: int = 50000, batch_size: int = 4096, iterations: int = 100,
+                 refine_iterations: int = 10, symmetric: bool = True, seed: int = 0) -> dict:
+    """Propose the vertex indices of every member of `SEGMENT_SEEDS` for a standing character.
+
+    The centroids are fitted on at most `sample_size` points, then every point goes to its
+    nearest centroid : the memory does not grow with the points cloud beyond the labels.
+    """
+    points = as_points_cloud(points)
+    keys = list(SEGMENT_SEEDS)
+    rng = np.random.default_rng(seed)
+
+    low, high = points.min(axis=0), points.max(axis=0)
+    center, size = (low + high) / 2, high - low
+
+    centroids = np.array([
+        (center[0] + x * size[0], center[1], low[2] + z * size[2]) for x, z in SEGMENT_SEEDS.values()
+    ])
+    counts = np.zeros(len(keys))
+
+    sample = points if len(points) <= sample_size else points[rng.choice(len(points), sample_size, replace=False)]
+
+    for _ in range(iterations):
+        batch = sample[rng.integers(0, len(sample), min(batch_size, len(sample)))]
+        labels = nearest_centroids(batch, centroids)
+
+        # Mise à jour de Sculley : chaque centre se déplace vers la moyenne de son lot,
+        # avec un pas de (taille du lot / points vus)
+        batch_counts = np.bincount(labels, minlength=len(keys)).astype(np.float64)
+        sums = np.stack([np.bincount(labels, weights=batch[:, j], minlength=len(keys)) for j in range(3)], axis=1)
+
+        counts += batch_counts
+        seen = batch_counts > 0
+        centroids[seen] += (sums[seen] - batch_counts[seen, None] * centroids[seen]) / counts[seen, None]
+
+        if symmetric:
+            symmetrize_centroids(centroids, keys, center[0])
+
+    # Affinage sur l'échantillon : gaussiennes alignées sur les axes (EM à affectation dure)
+    variances = weights = None
+    for _ in range(refine_iterations):
+        labels = nearest_centroids(sample, centroids, variances, weights)
+        counts = np.bincount(labels, minlength=len(keys)).astype(np.float64)
+        if np.any(counts < 2):
+            break
+
+        centroids = np.stack([np.bincount(labels, weights=sample[:, j], minlength=len(keys)) for j in range(3)], axis=1)
+        centroids /= counts[:, None]
+        squares = np.stack([np.bincount(labels, weights=sample[:, j] ** 2, minlength=len(keys)) for j in range(3)], axis=1)
+        variances = np.maximum(squares / counts[:, None] - centroids ** 2, (1e-3 * size.max()) ** 2)
+        weights = counts / counts.sum()
+
+        if symmetric:
+            symmetrize_centroids(centroids, keys, center[0], variances)
+
+    labels = nearest_centroids(points, centroids, variances, weights, chunk_size=max(sample_size, 1))
+    return {key: np.flatnonzero(labels == i) for i, key in enumerate(keys)}
@@ -0,0 +1,255 @@
+"""Headless batch rigging of many characters.
+
+The driver runs in plain Python (or in Blender) and farms one job per mesh out
+to a pool of background Blender processes:
+
+    python batch.py --meshes characters/ --settings settings/ --output rigged/ --jobs 8
+
+Every mesh (.fbx or .blend) of `--meshes` is paired with the settings file of the
+same name (.bgen or .json) found in `--settings`. Each job writes the rigged
+`<name>.blend` to `--output`, and the driver writes a `manifest.json` with the
+status and timings of every job. A job running longer than `--timeout` seconds
+is killed and recorded as failed.
+
+A worker is the same script run inside Blender:
+
+    blender -b --factory-startup --python batch.py -- --worker mesh.fbx settings.json out.blend result.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+MESH_EXTENSIONS = ('.fbx', '.blend')
+SETTINGS_EXTENSIONS = ('.bgen', '.json')
+
+# -------------------------------------------------------------------
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Rig a directory of characters with the Bone Generator add-on")
+    parser.add_argument('--meshes', help="Directory of the meshes to rig (.fbx or .blend)")
+    parser.add_argument('--settings', help="Directory of the matching settings files (default: --meshes)")
+    parser.add_argument('--output', help="Directory of the rigged .blend files and of the manifest")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="Number of Blender processes")
+    parser.add_argument('--blender', default=None, help="Blender executable (default: this Blender, or `blender`)")
+    parser.add_argument('--timeout', type=float, default=1800,
+                        help="Seconds a job may take before its Blender process is killed (0: no limit)")
+    parser.add_argument('--worker', nargs=4, metavar=('MESH', 'SETTINGS', 'OUTPUT', 'RESULT'),
+                        help="Rig a single mesh, only used inside a Blender process")
+
+    args = parser.parse_args(argv)
+    if args.worker is None and not (args.meshes and args.output):
+        parser.error("--meshes and --output are required")
+    return args
+
+
+def script_args():
+    """Arguments of the script, Blender passes them after `--`"""
+    if '--' in sys.argv:
+        return sys.argv[sys.argv.index('--') + 1:]
+    return sys.argv[1:]
+
+# -------------------------------------------------------------------
+# Driver
+
+
+def find_jobs(meshes_dir, settings_dir, output_dir) -> list:
+    """Pair every mesh with the settings file of the same name"""
+    jobs = []
+
+    for filename in sorted(os.listdir(meshes_dir)):
+        name, extension = os.path.splitext(filename)
+        if extension.lower() not in MESH_EXTENSIONS:
+            continue
+
+        settings = None
+        for settings_extension in SETTINGS_EXTENSIONS:
+            candidate = os.path.join(settings_dir, name + settings_extension)
+            if os.path.isfile(candidate):
+                settings = candidate
+                break
+
+        jobs.append({
+            'name': name,
+            'mesh': os.path.join(meshes_dir, filename),
+            'settings': settings,
+            'output': os.path.join(output_dir, name + '.blend'),
+            'result': os.path.join(output_dir, name + '.result.json'),
+        })
+
+    return jobs
+
+
+def default_blender() -> str:
+    try:
+        import bpy
+        return bpy.app.binary_path
+    except ImportError:
+        return 'blender'
+
+
+def run_job(blender, job, timeout: float = None) -> dict:
+    """Rig one mesh in its own background Blender process, killed after `timeout` seconds"""
+    entry = {key: job[key] for key in ('name', 'mesh', 'settings', 'output')}
+
+    if job['settings'] is None:
+        entry.update(status='SKIPPED', error="No settings file found")
+        return entry
+
+    command = [
+        blender, '-b', '--factory-startup', '--python', os.path.abspath(__file__),
+        '--', '--worker', job['mesh'], job['settings'], job['output'], job['result'],
+    ]
+    # One process per core: keep NumPy single threaded in every worker
+    env = dict(os.environ, OMP_NUM_THREADS='1', OPENBLAS_NUM_THREADS='1', MKL_NUM_THREADS='1')
+
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                 universal_newlines=True, timeout=timeout or None)
+    except subprocess.TimeoutExpired as e:
+        # A hung worker (e.g. a stalled heat weighting) must not hold its slot of the pool
+        output = e.output.decode('utf-8', 'replace') if isinstance(e.output, bytes) else (e.output or "")
+        entry.update(seconds=time.perf_counter() - start, status='FAILED', error=f"Timed out after {timeout:g}s",
+                     log=output.splitlines()[-20:])
+        if os.path.isfile(job['result']):
+            os.remove(job['result'])
+        return entry
+
+    entry['seconds'] = time.perf_counter() - start
+    entry['returncode'] = process.returncode
+
+    if os.path.isfile(job['result']):
+        with open(job['result'], 'r') as f:
+            entry.update(json.load(f))
+        os.remove(job['result'])
+    else:
+        entry['status'] = 'FAILED'
+
+    if entry.get('status') != 'FINISHED':
+        entry['log'] = process.stdout.splitlines()[-20:]
+
+    return entry
+
+
+def run_driver(args):
+    settings_dir = args.settings or args.meshes
+    blender = args.blender or default_blender()
+    os.makedirs(args.output, exist_ok=True)
+
+    jobs = find_jobs(args.meshes, settings_dir, args.output)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = list(pool.map(lambda job: run_job(blender, job, args.timeout), jobs))
+    seconds = time.perf_counter() - start
+
+    manifest = {
+        'jobs': results,
+        'workers': args.jobs,
+        'seconds': seconds,
+        'finished': sum(result.get('status') == 'FINISHED' for result in results),
+        'failed': sum(result.get('status') != 'FINISHED' for result in results),
+    }
+    with open(os.path.join(args.output, 'manifest.json'), 'w') as f:
+        f.write(json.dumps(manifest, indent=2))
+
+    print(f"{manifest['finished']}/{len(results)} characters rigged in {seconds:.1f}s")
+    return 0 if manifest['failed'] == 0 else 1
+
+# -------------------------------------------------------------------
+# Worker (inside Blender)
+
+
+def import_addon():
+    """Register the add-on from the directory of this script"""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(package_dir))
+
+    addon = importlib.import_module(os.path.basename(package_dir))
+    addon.register()
+    return addon
+
+
+def open_mesh(filepath):
+    """Open (.blend) or import (.fbx) a character, return its biggest mesh object"""
+    import bpy
+
+    if filepath.lower().endswith('.blend'):
+        bpy.ops.wm.open_mainfile(filepath=filepath)
+    else:
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        bpy.ops.import_scene.fbx(filepath=filepath)
+
+    meshes = [obj for obj in bpy.context.scene.objects if obj.type == 'MESH']
+    if not meshes:
+        raise RuntimeError(f"No mesh found in {filepath}")
+    return max(meshes, key=lambda obj: len(obj.data.vertices))
+
+
+def run_worker(mesh_path, settings_path, output_path, result_path):
+    import bpy
+
+    stages = {}
+    result = {'status': 'FAILED', 'stages': stages}
+
+    def stage(name, start):
+        stages[name] = time.perf_counter() - start
+
+    try:
+        start = time.perf_counter()
+        obj = open_mesh(mesh_path)
+        addon = import_addon()
+        stage('open', start)
+
+        scene = bpy.context.scene
+        scene.active_mesh = obj.name
+        bpy.context.view_layer.objects.active = obj
+
+        start = time.perf_counter()
+        addon.utils.get_loader(settings_path).load(scene)
+        stage('settings', start)
+        # The loaders only print when a file can not be read
+        if not scene.selected_members:
+            raise RuntimeError(f"No member loaded from {settings_path}")
+
+        start = time.perf_counter()
+        bpy.ops.bone_generator.compute_bones_generation()
+        stage('compute', start)
+        if obj.parent is None or obj.parent.type != 'ARMATURE':
+            raise RuntimeError(f"No armature generated for {obj.name}")
+
+        start = time.perf_counter()
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(output_path))
+        stage('save', start)
+
+        result['status'] = 'FINISHED'
+        result['vertices'] = len(obj.data.vertices)
+        result['members'] = len(scene.selected_members)
+    except Exception as e:
+        result['error'] = repr(e)
+
+    with open(result_path, 'w') as f:
+        f.write(json.dumps(result, indent=2))
+
+# -------------------------------------------------------------------
+
+
+def main(argv=None):
+    args = parse_args(script_args() if argv is None else argv)
+
+    if args.worker is not None:
+        run_worker(*args.worker)
+        return 0
+
+    return run_driver(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Micro-benchmarks of the backend math, in plain CPython (no Blender needed).
+
+    python benchmarks/bench_backend.py                          # 1e2 .. 1e6 points
+    python benchmarks/bench_backend.py --max-size 1e7 --save baseline.json
+    python benchmarks/bench_backend.py --compare baseline.json  # exit code 1 on regression
+
+Every case reports its best wall time over `--repeat` runs, its peak traced
+memory (tracemalloc, measured in a separate run) and its throughput in points
+per second. Synthetic members are noisy cylinders; the real members come from
+the shipped `examples/settings*.json` files.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import contextlib
+import importlib.util
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = [os.path.join(ROOT, 'examples', f'settings{i}.json') for i in (1, 2)]
+
+
+def import_backend():
+    """Load backend.py on its own, without importing the add-on package (and bpy)"""
+    spec = importlib.util.spec_from_file_location('backend', os.path.join(ROOT, 'backend.py'))
+    backend = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(backend)
+    return backend
+
+
+backend = import_backend()
+
+# -------------------------------------------------------------------
+
+
+def synthetic_member(size: int, seed: int = 0) -> np.ndarray:
+    """A noisy cylinder of `size` points, elongated along a random axis"""
+    rng = np.random.default_rng(seed)
+
+    axis = rng.normal(size=3)
+    axis /= np.linalg.norm(axis)
+    ortho = np.linalg.svd(axis[None, :])[2][1:]  # two unit vectors orthogonal to the axis
+
+    t = rng.uniform(-1, 1, size)
+    angle = rng.uniform(0, 2 * np.pi, size)
+    radius = 0.15 + rng.normal(scale=0.01, size=size)
+
+    points = np.outer(t, axis) + (radius * np.cos(angle))[:, None] * ortho[0] + (radius * np.sin(angle))[:, None] * ortho[1]
+    return points + rng.normal(size=3)
+
+
+def synthetic_members(size: int) -> dict:
+    """Six members sharing `size` points"""
+    keys = ['HEAD', 'BODY', 'LEFT ARM', 'RIGHT ARM', 'LEFT LEG', 'RIGHT LEG']
+    return {key: synthetic_member(max(size // len(keys), 2), seed) for seed, key in enumerate(keys)}
+
+
+def real_members(filepath) -> dict:
+    with open(filepath, 'r') as f:
+        return {key: np.asarray(value, dtype=np.float64) for key, value in json.load(f).items()}
+
+# -------------------------------------------------------------------
+
+
+def cases_for(label: str, members: dict) -> list:
+    """(name, points count, callable) of every benchmarked function for a set of members"""
+    member = max(members.values(), key=len)
+    barycenter = backend.compute_barycenter(member)
+    centered = backend.transform_space(barycenter, member)
+    covMatrix = backend.compute_covmatrix(centered, length=3)
+    keys, points, labels = backend.concatenate_members(members)
+    total = len(points)
+
+    return [
+        (f'compute_barycenter/{label}', len(member), lambda: backend.compute_barycenter(member)),
+        (f'transform_space/{label}', len(member), lambda: backend.transform_space(barycenter, member)),
+        (f'compute_covmatrix/{label}', len(member), lambda: backend.compute_covmatrix(centered, length=3)),
+        (f'power_method/{label}', len(member), lambda: backend.power_method(covMatrix, 100)),
+        (f'compute_bones_generation/{label}', total, lambda: backend.compute_bones_generation(None, members)),
+        (f'compute_bones_generation_segmented/{label}', total,
+         lambda: backend.compute_bones_generation_segmented(points, labels, keys)),
+        (f'compute_bones_generation_streaming/{label}', total,
+         lambda: backend.compute_bones_generation_streaming(members)),
+    ]
+
+
+def measure(function, repeat: int) -> dict:
+    # The backend prints its eigenvalues, keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {'seconds': min(times), 'peak_bytes': peak}
+
+
+def run(sizes, repeat: int) -> dict:
+    results = {}
+
+    datasets = [(f'synthetic-{size:.0e}', synthetic_members(size)) for size in sizes]
+    datasets += [(os.path.basename(filepath), real_members(filepath)) for filepath in EXAMPLES]
+
+    for label, members in datasets:
+        for name, count, function in cases_for(label, members):
+            result = measure(function, repeat)
+            result['points'] = count
+            result['points_per_second'] = count / result['seconds'] if result['seconds'] > 0 else float('inf')
+            results[name] = result
+
+            print(f"{name:<60} {result['seconds'] * 1e3:>10.3f} ms {result['peak_bytes'] / 2**20:>10.2f} MiB "
+                  f"{result['points_per_second']:>14.3e} pts/s")
+
+    return results
+
+# -------------------------------------------------------------------
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Names of the cases slower than `threshold` times their baseline"""
+    regressions = []
+
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+
+        ratio = result['seconds'] / reference['seconds'] if reference['seconds'] > 0 else 1
+        if ratio > threshold:
+            regressions.append(name)
+            print(f"REGRESSION {name}: {ratio:.2f}x slower than baseline")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Bone Generator backend")
+    parser.add_argument('--min-size', type=float, default=1e2, help="Smallest synthetic points cloud")
+    parser.add_argument('--max-size', type=float, default=1e6, help="Largest synthetic points cloud (up to 1e7)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case, the best one is kept")
+    parser.add_argument('--save', help="Write the results as a JSON baseline")
+    parser.add_argument('--compare', help="Baseline to compare the results with")
+    parser.add_argument('--threshold', type=float, default=1.5, help="Slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = [int(10 ** e) for e in range(int(np.log10(args.min_size)), int(np.log10(args.max_size)) + 1)]
+    results = run(sizes, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            f.write(json.dumps({
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'machine': platform.machine(),
+                'results': results,
+            }, indent=2))
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
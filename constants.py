@@ -14,4 +14,31 @@ COLORS = {
     'RIGHT ARM': (1, 0, 0, 1),
     'LEFT LEG': (1, 1, 0, 1),
     'RIGHT LEG': (1, 0, 1, 1),
-}
\ No newline at end of file
+}
+
+EIGEN_SOLVERS = [
+    ('EIGH', 'Closed Form', 'Direct symmetric eigendecomposition of the 3x3 covariance matrix', 0),
+    ('POWER', 'Power Iteration', 'Power iteration stopped on the convergence of the Rayleigh quotient', 1),
+]
+
+SETTINGS_FORMATS = [
+    ('.json', 'JSON', 'Text settings file, one list of coordinates per member', 0),
+    ('.bgen', 'Binary', 'Binary settings file, raw float32 coordinates and int32 indices, memory-mappable', 1),
+]
+
+SKINNING_MODES = [
+    ('HEAT', 'Automatic (Heat)', "Blender's heat diffusion weighting, slow on dense meshes", 0),
+    ('MEMBERS', 'Members', 'Each member to its bone, distance falloff for the other vertices, fast', 1),
+]
+
+REDUCTION_METHODS = [
+    ('NONE', 'None', 'Estimate the axes on every point of the members', 0),
+    ('RANDOM', 'Random', 'Estimate the axes on a uniform random sample of every member', 1),
+    ('AREA', 'Area Weighted', 'Sample the vertices proportionally to the area around them, evens out the density of scans', 2),
+    ('VOXEL', 'Voxel Grid', 'Keep one point per occupied cell of a regular grid', 3),
+]
+
+CHAIN_SPLITS = [
+    ('UNIFORM', 'Uniform', 'Split the limbs in bones of equal length along their axis', 0),
+    ('ADAPTIVE', 'Adaptive', 'Place the joints where the bones fit the points best (elbows, knees)', 1),
+]
@@ -0,0 +1,177 @@
+import os
+import json
+import numpy as np
+
+# -------------------------------------------------------------------
+# Formats of the settings files: reading and writing the arrays of the
+# members, without any bpy access (the scene side is `utils.SettingsLoader`).
+# A member is a dict of its float32 (N, 3) "points" and int32 (N,)
+# "indices" (None when unknown).
+
+
+class SettingsFile:
+    """Base of the settings file formats, a settings file stores the points cloud
+    (and optionally the vertex indices) of every member"""
+
+    extension = ""
+
+    def __init__(self, filepath):
+        self.filename = os.path.basename(filepath)
+        self.path = os.path.dirname(filepath)
+
+    def read_header(self) -> dict:
+        """Point count of every member"""
+        return {name: len(value["points"]) for name, value in self.read().items()}
+
+    def read_member(self, name) -> dict:
+        return self.read()[name]
+
+    def read(self) -> dict:
+        raise NotImplementedError
+
+    def write(self, data: dict):
+        raise NotImplementedError
+
+# -------------------------------------------------------------------
+
+
+class JSONFile(SettingsFile):
+    """Text format, `{member: [[x, y, z], ...]}`"""
+
+    extension = ".json"
+
+    def read(self) -> dict:
+        filepath = os.path.join(self.path, self.filename)
+
+        with open(filepath, 'r') as f:
+            raw_data = json.load(f)
+
+        return {
+            name: {"points": np.asarray(value, dtype=np.float32).reshape(-1, 3), "indices": None}
+            for name, value in raw_data.items()
+        }
+
+    def read_header(self) -> dict:
+        # A JSON file has to be parsed in full, keep it for the next `read_member`
+        self._data = self.read()
+        return {name: len(value["points"]) for name, value in self._data.items()}
+
+    def read_member(self, name) -> dict:
+        if getattr(self, "_data", None) is None:
+            self._data = self.read()
+        return self._data[name]
+
+    def write(self, data: dict):
+        filepath = os.path.join(self.path, self.filename)
+        out_data = {name: value["points"].tolist() for name, value in data.items()}
+
+        with open(filepath, 'w') as f:
+            f.write(json.dumps(out_data, indent=2))
+
+# -------------------------------------------------------------------
+
+
+class BinaryFile(SettingsFile):
+    """Binary format: a small JSON header followed by the raw arrays of every member.
+
+    | magic `BGEN` | version (uint32) | header size (uint32) | header | arrays ... |
+
+    The header lists, for every member, its point count and the byte offsets of its
+    float32 (N, 3) coordinates and int32 (N,) indices, so each array can be memory-mapped.
+    """
+
+    extension = ".bgen"
+
+    MAGIC = b"BGEN"
+    VERSION = 1
+    ALIGNMENT = 64
+
+    def read(self) -> dict:
+        filepath = os.path.join(self.path, self.filename)
+
+        return {member["name"]: self._map_member(filepath, member) for member in self._read_header()}
+
+    def read_header(self) -> dict:
+        return {member["name"]: member["count"] for member in self._read_header()}
+
+    def read_member(self, name) -> dict:
+        filepath = os.path.join(self.path, self.filename)
+
+        for member in self._read_header():
+            if member["name"] == name:
+                return self._map_member(filepath, member)
+        raise KeyError(name)
+
+    def _read_header(self) -> list:
+        filepath = os.path.join(self.path, self.filename)
+
+        with open(filepath, 'rb') as f:
+            prefix = f.read(12)
+            if len(prefix) < 12 or prefix[:4] != self.MAGIC:
+                raise IOError(f"{filepath} is not a valid settings file.")
+
+            version, header_size = np.frombuffer(prefix[4:], dtype='<u4')
+            header_bytes = f.read(int(header_size))
+            if version > self.VERSION or len(header_bytes) < header_size:
+                raise IOError(f"{filepath} is not a valid settings file.")
+
+        try:
+            return json.loads(header_bytes.decode('utf-8'))["members"]
+        except (ValueError, KeyError):
+            raise IOError(f"{filepath} has a corrupt header.")
+
+    def _map_member(self, filepath, member) -> dict:
+        count = member["count"]
+        return {
+            "points": self._memmap(filepath, member["points"], '<f4', (count, 3)),
+            "indices": self._memmap(filepath, member["indices"], '<i4', (count,)),
+        }
+
+    def write(self, data: dict):
+        filepath = os.path.join(self.path, self.filename)
+
+        arrays = []
+        members = []
+        for name, value in data.items():
+            points = np.asarray(value["points"], dtype='<f4').reshape(-1, 3)
+            indices = value.get("indices")
+            member = {"name": name, "count": len(points), "points": None, "indices": None}
+
+            arrays.append((member, "points", points))
+            if indices is not None and len(indices) == len(points):
+                arrays.append((member, "indices", np.asarray(indices, dtype='<i4')))
+            members.append(member)
+
+        # The offsets are written in the header, so its size is computed with placeholders first
+        header = {"members": members}
+        for member, key, array in arrays:
+            member[key] = 0xFFFFFFFFFF
+        offset = self._align(12 + len(json.dumps(header).encode('utf-8')))
+        for member, key, array in arrays:
+            member[key] = offset
+            offset = self._align(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode('utf-8')
+
+        with open(filepath, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(np.array([self.VERSION, len(header_bytes)], dtype='<u4').tobytes())
+            f.write(header_bytes)
+            for member, key, array in arrays:
+                f.write(b"\0" * (member[key] - f.tell()))
+                f.write(array.tobytes())
+
+    @classmethod
+    def _align(cls, offset: int) -> int:
+        return -(-offset // cls.ALIGNMENT) * cls.ALIGNMENT
+
+    @staticmethod
+    def _memmap(filepath, offset, dtype, shape):
+        if offset is None:
+            return None
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        try:
+            return np.memmap(filepath, dtype=dtype, mode='r', offset=offset, shape=shape)
+        except ValueError:
+            # Array past the end of a truncated file
+            raise IOError(f"{filepath} is truncated.")
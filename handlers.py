@@ -1,7 +1,9 @@
 import bpy
-from bpy.app.handlers import load_post, persistent
+from bpy.app.handlers import load_post, depsgraph_update_post, persistent
 
 from . import operators as ops
+from . import preview
+from . import mesh_cache
 
 # Handlers are callback functions "hooked" to some events of Blender's
 # internal loop. They are called whenever some event occurs.
@@ -22,6 +24,53 @@ def bone_generator_on_load(scene):
         # TODO : reset state bpy.ops.operator(ops.ResetSettings)
         print("A scene has been loaded!")
 
+    # Arrays of the target, ready before the first operator
+    mesh_cache.invalidate()
+    scene = bpy.context.scene
+    mesh_cache.warm(bpy.data.objects.get(scene.active_mesh), scene.use_mesh_cache_sidecar)
+
+    # Drop the preview of the previous file
+    preview.disable()
+    if bpy.context.scene.preview_settings.enabled:
+        preview.enable(bpy.context.scene)
+
+# -------------------------------------------------------------------
+
+
+@persistent
+def bone_generator_on_mesh_update(scene, depsgraph=None):
+    """Mark the cached arrays of the updated meshes to be refreshed"""
+    if depsgraph is None:
+        return
+
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+
+        data = update.id.original
+        if isinstance(data, bpy.types.Object):
+            data = data.data
+        if isinstance(data, bpy.types.Mesh):
+            mesh_cache.invalidate(data.name)
+
+# -------------------------------------------------------------------
+
+
+@persistent
+def bone_generator_on_depsgraph_update(scene, depsgraph=None):
+    """Schedule an update of the preview when the active mesh changes (selection included)"""
+    if not scene.preview_settings.enabled:
+        return
+
+    obj = bpy.data.objects.get(scene.active_mesh)
+    if obj is None or depsgraph is None:
+        return
+
+    for update in depsgraph.updates:
+        if update.id.original in (obj, obj.data):
+            preview.schedule(scene)
+            return
+
 # -------------------------------------------------------------------
 
 
@@ -35,7 +84,12 @@ def remove_handler(handlers_list, cb):
 def register():
     unregister()  # remove handlers if they were present already
     load_post.append(bone_generator_on_load)
+    depsgraph_update_post.append(bone_generator_on_mesh_update)
+    depsgraph_update_post.append(bone_generator_on_depsgraph_update)
 
 
 def unregister():
     remove_handler(load_post, bone_generator_on_load)
+    remove_handler(depsgraph_update_post, bone_generator_on_mesh_update)
+    remove_handler(depsgraph_update_post, bone_generator_on_depsgraph_update)
+    preview.disable()
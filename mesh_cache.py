@@ -0,0 +1,219 @@
+import os
+import bpy
+import hashlib
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------------------------------------------------
+# NumPy copy of the meshes the operators work on: vertex coordinates,
+# loop -> vertex map, polygon offsets and a spatial index of the world
+# coordinates. An entry is warmed when a file is loaded or the target
+# changes, marked stale by the depsgraph handler when its mesh is
+# updated, and refreshed on the next access: the arrays are read again
+# (one `foreach_get` each), the index is sorted again only when the
+# coordinates actually changed. The index is sorted in a worker thread,
+# and can be saved next to the .blend file.
+
+MATCH_DECIMALS = 4  # precision of the coordinates matched by `SpatialIndex.lookup`
+SIDECAR_DIRECTORY = "bone_generator_cache"
+
+_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def _hash_rows(keys) -> np.ndarray:
+    # Mélange des trois coordonnées entières, les collisions sont vérifiées à la recherche
+    return keys[:, 0] * np.int64(73856093) ^ keys[:, 1] * np.int64(19349663) ^ keys[:, 2] * np.int64(83492791)
+
+
+class SpatialIndex:
+    """Vertices sorted by a hash of their rounded world coordinates, to find a vertex from its position"""
+
+    def __init__(self, keys, order, hashes):
+        self.keys = keys
+        self.order = order
+        self.hashes = hashes
+
+    @staticmethod
+    def quantize(co) -> np.ndarray:
+        return np.round(np.asarray(co, dtype=np.float64) * 10 ** MATCH_DECIMALS).astype(np.int64)
+
+    @classmethod
+    def build(cls, co) -> 'SpatialIndex':
+        keys = cls.quantize(co)
+        hashes = _hash_rows(keys)
+        # Tri stable : à position égale, le premier sommet l'emporte
+        order = np.argsort(hashes, kind='stable')
+        return cls(keys, order, hashes[order])
+
+    def lookup(self, points) -> np.ndarray:
+        """Index of the first vertex at every position (rounded to MATCH_DECIMALS), -1 if none"""
+        queries = self.quantize(np.asarray(points).reshape(-1, 3))
+        hashes = _hash_rows(queries)
+
+        result = np.full(len(queries), -1, dtype=np.int64)
+        position = np.searchsorted(self.hashes, hashes)
+
+        # Parcours des vertices de même hash tant qu'aucun ne correspond (collisions, rares)
+        pending = np.arange(len(queries))
+        while len(pending):
+            valid = position[pending] < len(self.hashes)
+            pending = pending[valid]
+            valid = self.hashes[position[pending]] == hashes[pending]
+            pending = pending[valid]
+
+            candidates = self.order[position[pending]]
+            found = np.all(self.keys[candidates] == queries[pending], axis=1)
+            result[pending[found]] = candidates[found]
+
+            pending = pending[~found]
+            position[pending] += 1
+
+        return result
+
+
+class MeshData:
+
+    def __init__(self, mesh):
+        self.stale = False
+        self.matrix = None
+        self._index = None  # Future of the SpatialIndex
+        self.read(mesh)
+
+    def read(self, mesh):
+        self.counts = self.counts_of(mesh)
+
+        self.co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get('co', self.co)
+        self.co = self.co.reshape(-1, 3)
+        self.digest = hashlib.blake2b(self.co.tobytes(), digest_size=16).hexdigest()
+
+        self.loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get('vertex_index', self.loop_vertices)
+
+        loop_starts = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get('loop_start', loop_starts)
+        self.polygon_offsets = np.append(loop_starts, len(mesh.loops)).astype(np.int32)
+
+    @staticmethod
+    def counts_of(mesh) -> tuple:
+        return len(mesh.vertices), len(mesh.edges), len(mesh.loops), len(mesh.polygons)
+
+    @property
+    def fingerprint(self) -> str:
+        return hashlib.blake2b(f"{self.counts}{self.digest}".encode('utf-8'), digest_size=16).hexdigest()
+
+    def key(self, matrix_world) -> str:
+        """Fingerprint of the world coordinates: of the mesh and of its world matrix"""
+        matrix = np.array(matrix_world, dtype=np.float32)
+        return hashlib.blake2b(self.fingerprint.encode('utf-8') + matrix.tobytes(), digest_size=16).hexdigest()
+
+    def refresh(self, mesh):
+        """Read the mesh again after an update, keep the spatial index if the coordinates did not change"""
+        self.stale = False
+
+        # The topology is always read again: sorting the elements, flipping the normals or
+        # rotating an edge reorder the loops without changing any count
+        digest = self.digest
+        self.read(mesh)
+        if self.digest != digest:
+            self._index = None
+
+    def world_co(self, matrix_world) -> np.ndarray:
+        matrix_world = np.array(matrix_world, dtype=np.float32)
+        return self.co @ matrix_world[:3, :3].T + matrix_world[:3, 3]
+
+    def warm_index(self, matrix_world):
+        """Start sorting the spatial index in the background"""
+        matrix = np.array(matrix_world, dtype=np.float32)
+        if self._index is not None and np.array_equal(matrix, self.matrix):
+            return
+
+        self.matrix = matrix
+        self._index = _executor.submit(SpatialIndex.build, self.world_co(matrix))
+
+    def spatial_index(self, matrix_world) -> SpatialIndex:
+        self.warm_index(matrix_world)
+        return self._index.result()
+
+# -------------------------------------------------------------------
+
+
+_entries = {}  # keyed by mesh name
+
+
+def get(mesh) -> MeshData:
+    """Up to date arrays of a mesh (object mode data)"""
+    entry = _entries.get(mesh.name)
+
+    if entry is None:
+        entry = _entries[mesh.name] = MeshData(mesh)
+    elif entry.stale or entry.counts != MeshData.counts_of(mesh):
+        entry.refresh(mesh)
+
+    return entry
+
+
+def warm(obj, use_sidecar: bool = False):
+    """Build the arrays of a mesh object ahead of the first operator, the spatial index in the background"""
+    if obj is None or obj.type != 'MESH':
+        return
+
+    entry = get(obj.data)
+    if use_sidecar and load_sidecar(entry, obj.matrix_world):
+        return
+    entry.warm_index(obj.matrix_world)
+
+    if use_sidecar:
+        save_sidecar(entry, obj.matrix_world)
+
+
+def invalidate(mesh_name: str = None):
+    """Mark a mesh (every mesh if None) to be refreshed on its next access"""
+    if mesh_name is None:
+        _entries.clear()
+    elif mesh_name in _entries:
+        _entries[mesh_name].stale = True
+
+# -------------------------------------------------------------------
+# .npz sidecar (one .npy per array) next to the .blend file, named by
+# the fingerprint of the mesh and of its world matrix
+
+
+def sidecar_path(entry: MeshData, matrix_world):
+    if not bpy.data.filepath:
+        return None
+
+    return os.path.join(os.path.dirname(bpy.data.filepath), SIDECAR_DIRECTORY, entry.key(matrix_world) + ".npz")
+
+
+def load_sidecar(entry: MeshData, matrix_world) -> bool:
+    filepath = sidecar_path(entry, matrix_world)
+    if filepath is None or not os.path.isfile(filepath):
+        return False
+
+    try:
+        with np.load(filepath) as data:
+            index = SpatialIndex(data["keys"], data["order"], data["hashes"])
+    except (IOError, KeyError, ValueError):
+        return False
+
+    entry.matrix = np.array(matrix_world, dtype=np.float32)
+    entry._index = _executor.submit(lambda: index)
+    return True
+
+
+def save_sidecar(entry: MeshData, matrix_world):
+    filepath = sidecar_path(entry, matrix_world)
+    if filepath is None:
+        return
+
+    def save(future):
+        index = future.result()
+        try:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            np.savez(filepath, keys=index.keys, order=index.order, hashes=index.hashes)
+        except IOError as e:
+            print(f"Could not save the mesh cache {filepath}: {e}")
+
+    entry._index.add_done_callback(save)
@@ -1,15 +1,28 @@
 import os
 import bpy
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
 
 from bpy.types import Operator
-from bpy.props import EnumProperty
+from bpy.props import EnumProperty, StringProperty, BoolProperty, IntProperty
 from bpy.ops import view3d
 from bpy_extras.io_utils import ExportHelper, ImportHelper
 
-from .constants import MEMBERS_KEY, COLORS
+from .constants import MEMBERS_KEY, COLORS, SETTINGS_FORMATS
 
 from . import backend
 from . import utils
+from . import rigging
+from . import properties
+from . import profiling
+from .profiling import span
+
+# Principal components of the last computed members, only the members
+# whose points (or the generation settings) changed are computed again
+principal_components_cache = backend.PrincipalComponentsCache()
+# Same, for every mesh rigged by ComputeBonesGenerationSelected
+target_caches = {}
 
 # -------------------------------------------------------------------
 
@@ -33,14 +46,22 @@ class ResetSettings(BaseOperator):
     bl_idname = "bone_generator.reset_settings"
     bl_label = "Reset Settings"
 
+    @profiling.profiled
+    @utils.mode_scoped
     def execute(self, context):
         # Reset all colors
-        utils.mode_set(mode='OBJECT')
-        points_cloud = utils.get_vertices(context, 'ALL')
-        utils.color_to_vertices(context, points_cloud, (1, 1, 1, 1))
+        with span("color_to_vertices"):
+            utils.color_to_vertices(context, None, (1, 1, 1, 1))
 
-        context.scene.active_mesh = ""
+        with span("sync_vertex_group"):
+            for member in context.scene.selected_members:
+                utils.sync_vertex_group(context, member.name)
+
+        principal_components_cache.invalidate()
+
+        # Cleared first, the mesh keeps no member either
         context.scene.selected_members.clear()
+        context.scene.active_mesh = ""
         context.scene.selection_state.reset()
         return {'FINISHED'}
 
@@ -53,14 +74,29 @@ class SaveSettings(BaseOperator, ExportHelper):
 
     filename_ext = ".json"
 
+    filter_glob: StringProperty(default="*.json;*.bgen", options={'HIDDEN'})
+    file_format: EnumProperty(name="Format", items=SETTINGS_FORMATS, default='.json')
+
+    def check(self, context):
+        # The extension follows the selected format
+        self.filename_ext = self.file_format
+        return super().check(context)
+
+    @profiling.profiled
+    @utils.mode_scoped
     def execute(self, context):
         userpath = self.properties.filepath
 
-        if not userpath.lower().endswith('.json'):
-            self.report({'WARNING'}, "You need to export a valid .json file.")
+        if not userpath.lower().endswith(tuple(utils.SETTINGS_LOADERS)):
+            self.report({'WARNING'}, "You need to export a valid .json or .bgen file.")
 
-        json_loader = utils.JSONLoader(userpath)
-        json_loader.save(context.scene)
+        # Lazily loaded members are read before being written again
+        with span("load_members"):
+            utils.load_members(context)
+
+        with span("save"):
+            loader = utils.get_loader(userpath)
+            loader.save(context.scene)
         return {'FINISHED'}
 
 # -------------------------------------------------------------------
@@ -70,30 +106,75 @@ class LoadSettings(BaseOperator, ImportHelper):
     bl_idname = "bone_generator.load_settings"
     bl_label = "Load Settings"
 
+    filter_glob: StringProperty(default="*.json;*.bgen", options={'HIDDEN'})
+    lazy: BoolProperty(
+        name="Lazy",
+        description="Only read the list of members, each member is loaded when it is shown, edited or computed",
+        default=False,
+    )
+
+    @profiling.profiled
+    @utils.mode_scoped
     def execute(self, context):
         userpath = self.properties.filepath
-        if not userpath.lower().endswith('.json'):
-            self.report({'WARNING'}, "You need to import a valid .json file.")
+        if not userpath.lower().endswith(tuple(utils.SETTINGS_LOADERS)):
+            self.report({'WARNING'}, "You need to import a valid .json or .bgen file.")
 
         # Reset all colors
-        utils.mode_set(mode='OBJECT')
-        points_cloud = utils.get_vertices(context, 'ALL')
-        utils.color_to_vertices(context, points_cloud, (1, 1, 1, 1))
+        with span("color_to_vertices"):
+            utils.color_to_vertices(context, None, (1, 1, 1, 1))
+
+        principal_components_cache.invalidate()
 
         # Load
-        json_loader = utils.JSONLoader(userpath)
-        json_loader.load(context.scene)
+        if self.lazy:
+            with span("load_lazy"):
+                utils.get_lazy_loader(userpath, reload=True).load_lazy(context.scene)
+            return {'FINISHED'}
+
+        with span("load"):
+            loader = utils.get_loader(userpath)
+            loader.load(context.scene)
 
         # Colorize
         for member in context.scene.selected_members:
-            points_cloud = utils.get_vertices(context, 'MEMBER', member=member)
-            utils.color_to_vertices(context, points_cloud, COLORS[member.name])
+            with span(f"colorize {member.name}"):
+                indices = utils.get_member_indices(context, member)
+                utils.color_to_vertices(context, indices, COLORS[member.name])
+                utils.sync_vertex_group(context, member.name, indices)
 
         return {'FINISHED'}
 
 # -------------------------------------------------------------------
 
 
+class ConvertSettings(Operator, ImportHelper):
+    """Convert a .json settings file to the binary .bgen format, next to it"""
+    bl_idname = "bone_generator.convert_settings"
+    bl_label = "Convert Settings"
+
+    filter_glob: StringProperty(default="*.json", options={'HIDDEN'})
+
+    @profiling.profiled
+    def execute(self, context):
+        userpath = self.properties.filepath
+        if not userpath.lower().endswith('.json'):
+            self.report({'WARNING'}, "You need to convert a valid .json file.")
+            return {'CANCELLED'}
+
+        destination = os.path.splitext(userpath)[0] + utils.BinaryLoader.extension
+        try:
+            utils.convert_settings(userpath, destination)
+        except IOError:
+            self.report({'ERROR'}, f"Could not convert setting file {userpath}.")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Settings converted to {destination}")
+        return {'FINISHED'}
+
+# -------------------------------------------------------------------
+
+
 class AddMember(BaseOperator):
     bl_idname = "bone_generator.add_member"
     bl_label = "Add member"
@@ -106,13 +187,16 @@ class AddMember(BaseOperator):
                 found = True
         return super().poll(context) and not found and not context.scene.selection_state.is_active
 
+    @profiling.profiled
+    @utils.mode_scoped
     def execute(self, context):
         # Panel
         context.scene.selection_state.is_active = True
         context.scene.selection_state.selection_member_type = context.scene.active_member_type
 
         # 3D View (go to selection state)
-        utils.setup_selection_state(context)
+        with span("setup_selection_state"):
+            utils.setup_selection_state(context)
         return {'FINISHED'}
 
 # -------------------------------------------------------------------
@@ -122,10 +206,10 @@ def reset_color_member(context, member_type) -> int:
     # Find the member in the collection `selected_members`
     for idx, member in enumerate(context.scene.selected_members):
         if member_type == member.name:
-            # Get vertices in the active object mesh for the points cloud in the member
-            points_cloud = utils.get_vertices(context, 'MEMBER', member=context.scene.selected_members[member_type])
-            # Reset this colors
-            utils.color_to_vertices(context, points_cloud, (1, 1, 1, 1))
+            # Reset the colors of the member vertices in the active object mesh
+            # (a member still waiting to be loaded has never been painted)
+            if member.is_loaded():
+                utils.color_to_vertices(context, utils.get_member_indices(context, member), (1, 1, 1, 1))
             
             return idx
             
@@ -139,13 +223,39 @@ class ModifyMember(BaseOperator):
 
     member_type: EnumProperty(name="Member", items=MEMBERS_KEY)
 
+    @profiling.profiled
+    @utils.mode_scoped
     def execute(self, context):
+        # Lazily loaded member
+        with span("load_member"):
+            utils.load_member(context, context.scene.selected_members[self.member_type])
+
         # Panel
         context.scene.selection_state.is_active = True
         context.scene.selection_state.selection_member_type = self.member_type
 
-        # 3D View (go to selection state)
-        utils.setup_selection_state(context)
+        # 3D View (go to selection state), the member is selected to be refined
+        with span("setup_selection_state"):
+            utils.setup_selection_state(context)
+            member = context.scene.selected_members[self.member_type]
+            utils.select_vertices(bpy.data.objects[context.scene.active_mesh], utils.get_member_indices(context, member))
+        return {'FINISHED'}
+
+# -------------------------------------------------------------------
+
+
+class ShowMember(BaseOperator):
+    """Load and paint a member of a lazily loaded settings file"""
+    bl_idname = "bone_generator.show_member"
+    bl_label = "Show member"
+
+    member_type: EnumProperty(name="Member", items=MEMBERS_KEY)
+
+    @profiling.profiled
+    @utils.mode_scoped
+    def execute(self, context):
+        with span("load_member"):
+            utils.load_member(context, context.scene.selected_members[self.member_type])
         return {'FINISHED'}
 
 # -------------------------------------------------------------------
@@ -157,10 +267,70 @@ class DeleteMember(BaseOperator):
 
     member_type: EnumProperty(name="Member", items=MEMBERS_KEY)
 
+    @profiling.profiled
+    @utils.mode_scoped
     def execute(self, context):
-        idx = reset_color_member(context, self.member_type)
+        with span("reset_color_member"):
+            idx = reset_color_member(context, self.member_type)
         # Delete the member
         context.scene.selected_members.remove(idx)
+        principal_components_cache.invalidate(self.member_type)
+        with span("sync_vertex_group"):
+            utils.sync_vertex_group(context, self.member_type)
+        return {'FINISHED'}
+
+# -------------------------------------------------------------------
+
+
+class AutoSegment(BaseOperator):
+    """Propose the six members from the shape of the mesh, to be fixed up by hand"""
+    bl_idname = "bone_generator.auto_segment"
+    bl_label = "Auto Segment"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    sample_size: IntProperty(
+        name="Sample Size",
+        description="Number of vertices the clusters are fitted on, bounds the time and the memory",
+        default=50000, min=1000,
+    )
+    symmetric: BoolProperty(
+        name="Symmetric",
+        description="Keep the left and right members mirrored about the middle of the mesh (X axis)",
+        default=True,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return super().poll(context) and not context.scene.selection_state.is_active
+
+    @profiling.profiled
+    @utils.mode_scoped
+    def execute(self, context):
+        obj = bpy.data.objects[context.scene.active_mesh]
+
+        with span("get_coordinates"):
+            coordinates = utils.get_coordinates(obj)
+
+        with span("auto_segment"):
+            segments = backend.auto_segment(coordinates, sample_size=self.sample_size, symmetric=self.symmetric)
+
+        with span("color_to_vertices"):
+            utils.color_to_vertices(context, None, (1, 1, 1, 1))
+
+        principal_components_cache.invalidate()
+        context.scene.selected_members.clear()
+        coordinates_key = utils.get_coordinates_key(obj)
+
+        for name, indices in segments.items():
+            with span(f"colorize {name}"):
+                member = context.scene.selected_members.add()
+                member.name = name
+                member.set_points(coordinates[indices], coordinates_key=coordinates_key)
+                member.set_indices(indices)
+
+                utils.color_to_vertices(context, indices, COLORS[name])
+                utils.sync_vertex_group(context, name, indices)
+
         return {'FINISHED'}
 
 # -------------------------------------------------------------------
@@ -174,41 +344,71 @@ class ValidateSelection(BaseOperator):
     def poll(cls, context):
         return super().poll(context) and context.scene.selection_state.is_active
 
+    @profiling.profiled
+    @utils.mode_scoped
     def execute(self, context):
-        reset_color_member(context, context.scene.selection_state.selection_member_type)
+        member_type = context.scene.selection_state.selection_member_type
+        obj = bpy.data.objects[context.scene.active_mesh]
 
         # Panel
         context.scene.selection_state.is_active = False
 
-        points_cloud = utils.get_vertices(context, 'SELECTED')
-        
-        utils.color_to_vertices(context, points_cloud, COLORS[context.scene.selection_state.selection_member_type])
-
-        matrix_world = bpy.data.objects[context.scene.active_mesh].matrix_world
-
-        found = False
-        for idx, member in enumerate(context.scene.selected_members):
-            if context.scene.selection_state.selection_member_type == member.name:
-                found = True
-
-                # Update
-                new_member = context.scene.selected_members[idx]
-                new_member.points_cloud.clear()
-                for point in points_cloud:
-                    new_point = new_member.points_cloud.add()
-                    new_point.set(matrix_world @ point.co)
-
-        # Add
-        if not found:
-            new_member = context.scene.selected_members.add()
-            new_member.name = context.scene.selection_state.selection_member_type
-            new_member.points_cloud.clear()
-            for point in points_cloud:
-                new_point = new_member.points_cloud.add()
-                new_point.set(matrix_world @ point.co)
+        with span("get_selection_mask"):
+            selected = utils.get_selection_mask(obj.data)
+
+        member = context.scene.selected_members.get(member_type)
+        if member is None:
+            member = context.scene.selected_members.add()
+            member.name = member_type
+            member.set_indices(np.empty(0, dtype=np.int32))
+        else:
+            utils.load_member(context, member)
+
+        # Only the vertices added to or removed from the member are read, painted and
+        # accounted for in its moments, which the generation and the preview then reuse
+        with span("update_member"):
+            # Vertices may have been moved, added or deleted in edit mode meanwhile: the edit
+            # data is flushed once, the key then tells whether the stored points are still valid
+            utils.flush_edit_data(obj)
+            coordinates_key = utils.get_coordinates_key(obj)
+
+            old_indices = utils.get_member_indices(context, member)
+            old_indices = old_indices[old_indices < len(selected)]
+            if member.coordinates_key != coordinates_key or member.point_count != len(old_indices):
+                # Points read from another state of the mesh (or from a file): read again
+                member.set_points(utils.get_coordinates(obj, old_indices, flush=False), coordinates_key=coordinates_key)
+            old_points = member.get_points()
+
+            kept = selected[old_indices]
+            removed = old_indices[~kept]
+            selected[old_indices] = False
+            added = np.flatnonzero(selected)
+
+            added_points = utils.get_coordinates(obj, added, flush=False)
+            statistics = member.get_statistics().remove(old_points[~kept]).add(added_points)
+
+            member.set_points(np.concatenate([old_points[kept], added_points]), statistics, coordinates_key)
+            member.set_indices(np.concatenate([old_indices[kept], added]))
+
+        with span("color_to_vertices"):
+            if len(removed):
+                utils.color_to_vertices(context, removed, (1, 1, 1, 1))
+            if len(added):
+                utils.color_to_vertices(context, added, COLORS[member_type])
+
+        principal_components_cache.invalidate(member.name)
+
+        with span("sync_vertex_group"):
+            utils.sync_vertex_group(context, member.name, member.get_indices())
+
+        if statistics.count >= 2:
+            axis = statistics.principal_axis(solver=context.scene.generation_settings.eigen_solver)
+            self.report({'INFO'}, f"{member.name}: {int(statistics.count)} points "
+                                  f"(+{len(added)} / -{len(removed)}), axis {tuple(axis.round(3))}")
 
         # View 3D (back to normal state)
-        utils.back_to_normal_state(context)
+        with span("back_to_normal_state"):
+            utils.back_to_normal_state(context)
         return {'FINISHED'}
 
 # -------------------------------------------------------------------
@@ -218,12 +418,15 @@ class CancelSelection(BaseOperator):
     bl_idname = "bone_generator.cancel_selection"
     bl_label = "Cancel selection"
 
+    @profiling.profiled
+    @utils.mode_scoped
     def execute(self, context):
         # Panel
         context.scene.selection_state.reset()
 
         # View 3D (back to normal state)
-        utils.back_to_normal_state(context)
+        with span("back_to_normal_state"):
+            utils.back_to_normal_state(context)
         return {'FINISHED'}
 
 # -------------------------------------------------------------------
@@ -238,11 +441,44 @@ class ComputeBonesGeneration(BaseOperator):
     def poll(cls, context):
         return super().poll(context) # and len(context.scene.selected_members) == 6
 
+    @profiling.profiled
+    @utils.mode_scoped
     def execute(self, context):
         # The operator class defines the front-end to a function. Its core
         # logic will likely resides in a separate module (called 'backend' here)
         # as a regular python function.
-        principal_components = backend.compute_bones_generation(context.active_object, utils.JSONLoader.to_serializable(context.scene))
+        with span("get_members_points"):
+            members = utils.get_members_points(context)
+        settings = context.scene.generation_settings
+
+        # Every backend path skips the members without points
+        empty = [name for name, points in members.items() if len(points) == 0]
+        if empty:
+            self.report({'WARNING'}, f"Members without points are skipped: {', '.join(empty)}")
+
+        with span("get_members_moments"):
+            obj = bpy.data.objects[context.scene.active_mesh]
+            moments = utils.get_members_moments(obj, context.scene.selected_members)
+
+        weights = None
+        if settings.reduction == 'AREA':
+            with span("get_members_areas"):
+                weights = utils.get_members_areas(context)
+
+        with span("compute_bones_generation"):
+            principal_components, table = rigging.compute_skeleton(
+                principal_components_cache, members, settings.snapshot(), weights, moments
+            )
+
+        if settings.reduction != 'NONE' and settings.report_reduction_error:
+            with span("reduction_angular_errors"):
+                errors = backend.reduction_angular_errors(
+                    members, settings.reduction, settings.sample_size, weights,
+                    solver=settings.eigen_solver, max_iterations=settings.max_iterations, tolerance=settings.tolerance,
+                )
+            self.report({'INFO'}, "Reduction angular error (degrees): " + ", ".join(
+                f"{name} {error:.3f}" for name, error in errors.items()
+            ))
         
         # We can report messages to the user, doc at:
         # https://docs.blender.org/api/current/bpy.types.Operator.html#bpy.types.Operator.Operator.report
@@ -250,66 +486,27 @@ class ComputeBonesGeneration(BaseOperator):
 
         if principal_components:
 
-            # création de l'armature
-            utils.mode_set(mode='OBJECT')
-            bpy.ops.object.armature_add(location=(0, 0, 0))
-            armature = bpy.context.active_object
-
-            utils.mode_set(mode='EDIT')
-
-            # On unpack les valeurs
-            head, tail = principal_components['BODY']
-
-            bone_body = bpy.context.active_bone
-            # On lui assigne ses postions correspondante
-            bone_body.head = head
-            bone_body.tail = tail
-
-            for key, points in principal_components.items():
-                if key == 'BODY': continue
-
-                # On unpack les valeurs
-                head, tail = points
-
-                # On crée l'armature
-                bone = armature.data.edit_bones.new(name=f'Bone{key}')
-                # On lui assigne ses postions correspondante
-                
-                if 'LEG' in key:
-                    bone.head = tail
-                    bone.tail = head
-
-                    bone_racc = armature.data.edit_bones.new(name=f'Bone{key}_Raccordement')
-                    bone_racc.head = bone_body.head
-                    bone_racc.tail = bone.head
-                
-                if key == 'HEAD':
-                    bone.head = tail 
-                    bone.tail = head
-
-                    bone_racc = armature.data.edit_bones.new(name=f'Bone{key}_Raccordement')
-                    bone_racc.head = bone_body.tail
-                    bone_racc.tail = bone.head
-
-                if 'ARM' in key:
-                    bone.head = head
-                    bone.tail = tail
-
-                    bone_racc = armature.data.edit_bones.new(name=f'Bone{key}_Raccordement')
-                    bone_racc.head = bone_body.tail
-                    bone_racc.tail = bone.head
-                
-                bone.use_relative_parent = True
-                bone.parent = bone_racc
-
-                bone_racc.use_relative_parent = True
-                bone_racc.parent = bone_body
-
-            utils.mode_set(mode='OBJECT')
+            with span("edit_bones"):
+                # création de l'armature, sans passer par `armature_add`
+                armature = rigging.create_armature("Armature", table)
+
             cube = bpy.data.objects[context.scene.active_mesh]
-            cube.select_set(True)
-            armature.select_set(True)
-            bpy.ops.object.parent_set(type='ARMATURE_AUTO')
+
+            if settings.skinning == 'MEMBERS':
+                with span("skin_members"):
+                    member_indices = {
+                        # Bounded by the current vertex count
+                        member.name: utils.get_vertex_indices(context, 'MEMBER', member=member)
+                        for member in context.scene.selected_members
+                    }
+                    rigging.skin_members(
+                        cube, armature, table, utils.get_coordinates(cube), member_indices, influences=settings.influences
+                    )
+            else:
+                with span("parent_set"):
+                    # L'armature est déjà active et sélectionnée
+                    cube.select_set(True)
+                    bpy.ops.object.parent_set(type='ARMATURE_AUTO')
 
             # debug
             # utils.mode_set('OBJECT')
@@ -322,15 +519,142 @@ class ComputeBonesGeneration(BaseOperator):
 # -------------------------------------------------------------------
 
 
+class ComputeBonesGenerationSelected(Operator):
+    """Rig every selected mesh from its own members, the computations of all meshes run in parallel"""
+    bl_idname = "bone_generator.compute_bones_generation_selected"
+    bl_label = "Rig Selected Meshes"
+
+    @classmethod
+    def poll(cls, context):
+        return any(obj.type == 'MESH' for obj in context.selected_objects) and not context.scene.selection_state.is_active
+
+    @profiling.profiled
+    @utils.mode_scoped
+    def execute(self, context):
+        scene = context.scene
+        settings = scene.generation_settings.snapshot()
+
+        # The members being edited belong to the active mesh
+        if scene.active_mesh in bpy.data.objects:
+            with span("load_members"):
+                utils.load_members(context)
+            properties.store_members(scene)
+
+        targets = [obj for obj in context.selected_objects if obj.type == 'MESH' and len(obj.bone_generator_members)]
+        if not targets:
+            self.report({'WARNING'}, "No selected mesh has members.")
+            return {'CANCELLED'}
+
+        # bpy reads, on the main thread
+        with span("get_members_points"):
+            utils.require_mode('OBJECT')
+            inputs = {}
+            for obj in targets:
+                coordinates = utils.get_coordinates(obj)
+                indices = utils.get_object_members_indices(obj)
+                missing = [member.name for member in obj.bone_generator_members if member.name not in indices]
+                if missing:
+                    self.report({'WARNING'}, f"Members of {obj.name} that could not be loaded are skipped: {', '.join(missing)}")
+                areas = utils.get_vertex_areas(obj) if scene.generation_settings.reduction == 'AREA' else None
+                inputs[obj.name] = (
+                    coordinates, indices,
+                    {name: coordinates[idx] for name, idx in indices.items()},
+                    None if areas is None else {name: areas[idx] for name, idx in indices.items()},
+                )
+
+        # NumPy releases the GIL : one thread per target
+        with span("compute_skeletons"):
+            with ThreadPoolExecutor(max_workers=min(len(targets), os.cpu_count() or 1)) as pool:
+                futures = {
+                    name: pool.submit(
+                        rigging.compute_skeleton,
+                        target_caches.setdefault(name, backend.PrincipalComponentsCache()), members, settings, weights
+                    )
+                    for name, (_, _, members, weights) in inputs.items()
+                }
+                tables = {name: future.result()[1] for name, future in futures.items()}
+
+        tables = {name: table for name, table in tables.items() if table}
+        rigged = [obj for obj in targets if obj.name in tables]
+
+        # bpy writes, serialized on the main thread : every armature in one edit session
+        with span("edit_bones"):
+            armatures = rigging.create_armatures([(f"{obj.name} Armature", tables[obj.name]) for obj in rigged])
+
+        if settings['skinning'] == 'MEMBERS':
+            with span("compute_member_weights"):
+                with ThreadPoolExecutor(max_workers=min(len(rigged), os.cpu_count() or 1) or 1) as pool:
+                    weights = list(pool.map(
+                        lambda obj: rigging.compute_member_weights(
+                            tables[obj.name], inputs[obj.name][0], inputs[obj.name][1], influences=settings['influences']
+                        ),
+                        rigged,
+                    ))
+            with span("write_skin"):
+                for obj, armature, obj_weights in zip(rigged, armatures, weights):
+                    rigging.write_skin(obj, armature, obj_weights)
+        else:
+            with span("parent_set"):
+                view_layer = context.view_layer
+                for obj, armature in zip(rigged, armatures):
+                    for selected in view_layer.objects.selected:
+                        selected.select_set(False)
+                    obj.select_set(True)
+                    armature.select_set(True)
+                    view_layer.objects.active = armature
+                    bpy.ops.object.parent_set(type='ARMATURE_AUTO')
+
+        self.report({'INFO'}, f"{len(rigged)} meshes rigged")
+        return {'FINISHED'}
+
+# -------------------------------------------------------------------
+
+
+class ExportProfile(Operator, ExportHelper):
+    """Export the recorded profiling runs to a .json file"""
+    bl_idname = "bone_generator.export_profile"
+    bl_label = "Export Profile"
+
+    filename_ext = ".json"
+
+    def execute(self, context):
+        try:
+            profiling.PROFILER.export(self.properties.filepath)
+        except IOError:
+            self.report({'ERROR'}, f"Could not export profile in {self.properties.filepath}.")
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+# -------------------------------------------------------------------
+
+
+class ClearProfile(Operator):
+    """Forget the recorded profiling runs"""
+    bl_idname = "bone_generator.clear_profile"
+    bl_label = "Clear Profile"
+
+    def execute(self, context):
+        profiling.PROFILER.clear()
+        return {'FINISHED'}
+
+# -------------------------------------------------------------------
+
+
 classes = (
     ResetSettings,
     SaveSettings,
     LoadSettings,
+    ConvertSettings,
     AddMember,
     ModifyMember,
+    ShowMember,
     DeleteMember,
     ValidateSelection,
     CancelSelection,
-    ComputeBonesGeneration
+    AutoSegment,
+    ComputeBonesGeneration,
+    ComputeBonesGenerationSelected,
+    ExportProfile,
+    ClearProfile,
 )
 register, unregister = bpy.utils.register_classes_factory(classes)
@@ -2,6 +2,8 @@ import bpy
 from bpy.types import Panel
 
 from . import operators as ops
+from . import profiling
+from . import preview
 
 from .constants import MEMBERS_KEY, COLORS
 
@@ -30,17 +32,24 @@ class BoneGeneratorPanel(Panel):
 
         # Use operator's bl_idname rather than explicitely writing
         layout.operator(ops.ComputeBonesGeneration.bl_idname)
+        layout.operator(ops.ComputeBonesGenerationSelected.bl_idname)
+
+        # Options of the bones generation
+        self.draw_generation_settings(scene.generation_settings, layout.box())
 
         # TODO : poll ...
         layout.operator(ops.SaveSettings.bl_idname)
         layout.operator(ops.LoadSettings.bl_idname)
+        layout.operator(ops.ConvertSettings.bl_idname)
 
         # Reset all parameters
         layout.operator(ops.ResetSettings.bl_idname)
 
         # Select object to edit, in the scene
-        layout.prop_search(scene, "active_mesh", scene,
-                           "objects", icon='OBJECT_DATA', text="Object")
+        row = layout.row()
+        row.prop_search(scene, "active_mesh", scene,
+                        "objects", icon='OBJECT_DATA', text="Object")
+        row.prop(scene, "use_mesh_cache_sidecar", text="", icon="FILE_CACHE")
 
         # Add a new member
         row = layout.row()
@@ -48,6 +57,9 @@ class BoneGeneratorPanel(Panel):
         row.prop(scene, "active_member_type")
         row.operator(ops.AddMember.bl_idname, text="", icon="ADD")
 
+        # Propose every member at once
+        layout.operator(ops.AutoSegment.bl_idname)
+
         # Scene value
         selected_members = scene.selected_members
         selection_state = scene.selection_state
@@ -71,16 +83,116 @@ class BoneGeneratorPanel(Panel):
                 row.template_node_socket(color=COLORS[member_name])
                 row.label(text=member_name)
 
+                if not member.is_loaded():
+                    props = row.operator(ops.ShowMember.bl_idname, text="", icon="HIDE_OFF")
+                    props.member_type = member_name
+
                 props = row.operator(ops.ModifyMember.bl_idname, text="", icon="MODIFIER")
                 props.member_type = member_name
 
                 props = row.operator(ops.DeleteMember.bl_idname, text="", icon="TRASH")
                 props.member_type = member_name
 
+    def draw_generation_settings(self, settings, layout):
+        """Show options used by the bones generation"""
+        layout.prop(settings, "single_pass")
+        layout.prop(settings, "eigen_solver")
+
+        if settings.eigen_solver == 'POWER':
+            row = layout.row(align=True)
+            row.prop(settings, "max_iterations")
+            row.prop(settings, "tolerance")
+
+        layout.prop(settings, "trim")
+
+        row = layout.row(align=True)
+        row.prop(settings, "reduction")
+        if settings.reduction != 'NONE':
+            row.prop(settings, "sample_size")
+            row.prop(settings, "report_reduction_error")
+        layout.prop(settings, "use_vertex_groups")
+
+        row = layout.row(align=True)
+        row.prop(settings, "chain_bones")
+        if settings.chain_bones > 1:
+            row.prop(settings, "chain_split")
+
+        row = layout.row(align=True)
+        row.prop(settings, "skinning")
+        if settings.skinning == 'MEMBERS':
+            row.prop(settings, "influences")
+
+# -------------------------------------------------------------------
+
+
+class BoneGeneratorPreviewPanel(Panel):
+    bl_label = "Preview"
+    bl_idname = "SCENE_PT_BoneGeneratorPreviewPanel"
+    bl_space_type = 'PROPERTIES'
+    bl_region_type = 'WINDOW'
+    bl_context = "scene"
+    bl_parent_id = BoneGeneratorPanel.bl_idname
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw_header(self, context):
+        self.layout.prop(context.scene.preview_settings, "enabled", text="")
+
+    def draw(self, context):
+        settings = context.scene.preview_settings
+        layout = self.layout
+
+        row = layout.row()
+        row.prop(settings, "debounce")
+        row.prop(settings, "budget")
+
+        if settings.enabled:
+            layout.label(text=f"Last update {preview.STATE.last_cost * 1e3:.1f} ms", icon="TIME")
+
+# -------------------------------------------------------------------
+
+
+class BoneGeneratorProfilingPanel(Panel):
+    bl_label = "Profiling"
+    bl_idname = "SCENE_PT_BoneGeneratorProfilingPanel"
+    bl_space_type = 'PROPERTIES'
+    bl_region_type = 'WINDOW'
+    bl_context = "scene"
+    bl_parent_id = BoneGeneratorPanel.bl_idname
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw_header(self, context):
+        self.layout.prop(context.scene.profiling_settings, "enabled", text="")
+
+    def draw(self, context):
+        settings = context.scene.profiling_settings
+        layout = self.layout
+
+        row = layout.row()
+        row.prop(settings, "track_memory")
+        row.prop(settings, "history")
+
+        row = layout.row()
+        row.operator(ops.ExportProfile.bl_idname, icon="EXPORT")
+        row.operator(ops.ClearProfile.bl_idname, icon="TRASH")
+
+        # Last runs first, with their stages
+        for run in reversed(profiling.PROFILER.runs):
+            box = layout.box()
+            text = f"{run['operator']}  {run['seconds'] * 1e3:.1f} ms"
+            if 'peak_bytes' in run:
+                text += f"  peak {run['peak_bytes'] / 2**20:.1f} MiB"
+            box.label(text=text, icon="TIME")
+
+            col = box.column(align=True)
+            for span in run['spans']:
+                col.label(text=f"{'    ' * span['depth']}{span['name']}  {span['seconds'] * 1e3:.1f} ms")
+
 # -------------------------------------------------------------------
 
 
 classes = (
     BoneGeneratorPanel,
+    BoneGeneratorPreviewPanel,
+    BoneGeneratorProfilingPanel,
 )
 register, unregister = bpy.utils.register_classes_factory(classes)
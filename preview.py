@@ -0,0 +1,241 @@
+import bpy
+import bgl
+import gpu
+import time
+import numpy as np
+
+from gpu_extras.batch import batch_for_shader
+
+from .constants import COLORS
+from . import backend
+from . import rigging
+from . import utils
+
+# -------------------------------------------------------------------
+# Preview of the skeleton in the 3D view, before any armature is built.
+# The depsgraph handler (see handlers.py) only schedules an update: the
+# updates coming in while one is scheduled are dropped, and an update
+# slower than the frame budget pushes the next one further away, so the
+# viewport keeps its frame rate on big meshes. Once a full update is
+# over budget, the next ones are light: the other members keep their
+# bones of the last full update (no read, no hash), only the member
+# being selected is computed again, on a sample of its points and as a
+# single bone. A full update is tried again every few light ones, once
+# the cache is warm.
+
+CONNECTION_COLOR = (0.8, 0.8, 0.8, 1)
+LIGHT_SAMPLE_SIZE = 2000  # points of the selected member in a light update
+FULL_RETRY = 10  # light updates between two full ones
+
+
+class PreviewState:
+
+    def __init__(self):
+        self.cache = backend.PrincipalComponentsCache()
+        self.components = {}  # principal components (or chain joints) of the last update
+        self.table = []
+        self.scheduled = False
+        self.last_cost = 0.0
+        self.full_cost = 0.0  # of the last full update, light updates once over budget
+        self.light_updates = 0  # since the last full update
+        self.batches = None  # built in the draw callback, from `table`
+        self.draw_handle = None
+
+
+STATE = PreviewState()
+
+# -------------------------------------------------------------------
+
+
+def light_settings(settings: dict) -> dict:
+    """Cheaper copy of a settings snapshot: reduced points, no chains"""
+    generation = dict(settings['generation'])
+    if generation['reduction'] == 'NONE':
+        generation['reduction'] = 'RANDOM'
+    generation['sample_size'] = min(generation['sample_size'], LIGHT_SAMPLE_SIZE)
+
+    return dict(settings, generation=generation, chain_bones=1)
+
+
+def read_selection(obj) -> np.ndarray:
+    """Indices of the selected vertices, read from bmesh in edit mode.
+
+    The vertices added since entering the edit mode are not in `mesh.vertices`
+    yet, they are left out of the preview.
+    """
+    mask = utils.get_selection_mask(obj.data)
+    return np.flatnonzero(mask[:len(obj.data.vertices)])
+
+
+def compute_preview(scene) -> dict:
+    """Principal components of the current members, the member being selected included"""
+    obj = bpy.data.objects.get(scene.active_mesh)
+    if obj is None or obj.type != 'MESH':
+        return {}
+
+    # The vertices are not moved while selecting: `mesh.vertices` is still up to date in edit
+    # mode, and flushing the edit data would trigger another depsgraph update
+    coordinates = utils.get_coordinates(obj, flush=False)
+
+    members = {}
+    for member in scene.selected_members:
+        # Nothing is loaded nor painted from a handler
+        if member.is_loaded() and member.has_indices():
+            indices = member.get_indices()
+            members[member.name] = coordinates[indices[indices < len(coordinates)]]
+
+    # The axis of the validated members comes from their stored moments
+    moments = utils.get_members_moments(obj, scene.selected_members)
+
+    if scene.selection_state.is_active:
+        members[scene.selection_state.selection_member_type] = coordinates[read_selection(obj)]
+        moments.pop(scene.selection_state.selection_member_type, None)
+
+    members = {name: points for name, points in members.items() if len(points) >= 2}
+    if not members:
+        return {}
+
+    components, _ = rigging.compute_skeleton(STATE.cache, members, scene.generation_settings.snapshot(), moments=moments)
+    return components
+
+
+def compute_light_preview(scene) -> dict:
+    """Principal components of the last update, only the member being selected computed again"""
+    components = dict(STATE.components)
+
+    obj = bpy.data.objects.get(scene.active_mesh)
+    if obj is None or obj.type != 'MESH' or not scene.selection_state.is_active:
+        return components
+
+    # Only the selected vertices are read
+    name = scene.selection_state.selection_member_type
+    points = utils.get_coordinates(obj, read_selection(obj), flush=False)
+    components.pop(name, None)
+
+    if len(points) >= 2:
+        settings = light_settings(scene.generation_settings.snapshot())
+        selected, _ = rigging.compute_skeleton(STATE.cache, {name: points}, settings)
+        components.update(selected)
+
+    return components
+
+# -------------------------------------------------------------------
+
+
+def schedule(scene):
+    """Ask for an update, dropped if one is already on its way"""
+    if STATE.scheduled:
+        return
+
+    settings = scene.preview_settings
+    budget = settings.budget / 1000
+
+    # Une mise à jour plus longue que le budget espace d'autant les suivantes
+    delay = settings.debounce * max(1.0, STATE.last_cost / budget) if budget > 0 else settings.debounce
+
+    STATE.scheduled = True
+    bpy.app.timers.register(_update, first_interval=delay)
+
+
+def _update():
+    STATE.scheduled = False
+    scene = bpy.context.scene
+    if not scene.preview_settings.enabled:
+        return None
+
+    # Au-delà du budget, mises à jour légères, avec un nouvel essai complet de temps en temps :
+    # la première mise à jour complète remplit le cache, les suivantes coûtent moins
+    budget = scene.preview_settings.budget / 1000
+    light = STATE.full_cost > budget and STATE.light_updates < FULL_RETRY
+
+    start = time.perf_counter()
+    try:
+        STATE.components = compute_light_preview(scene) if light else compute_preview(scene)
+    except (ValueError, IndexError, np.linalg.LinAlgError) as e:
+        print(f"Preview update failed: {e}")
+        STATE.components = {}
+    STATE.table = rigging.build_bone_table(STATE.components)
+    STATE.last_cost = time.perf_counter() - start
+
+    if light:
+        STATE.light_updates += 1
+    else:
+        STATE.full_cost = STATE.last_cost
+        STATE.light_updates = 0
+
+    STATE.batches = None
+    tag_redraw()
+    return None
+
+
+def tag_redraw():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+# -------------------------------------------------------------------
+
+
+def build_batches(shader) -> list:
+    """(color, batch) of the bones of every member, of the connections and of the joints"""
+    lines = {}
+    joints = []
+
+    for name, head, tail, parent in STATE.table:
+        key = name[len('Bone'):].split('.')[0]
+        color = CONNECTION_COLOR if name.endswith('_Raccordement') else COLORS.get(key, CONNECTION_COLOR)
+        if name == rigging.BODY_BONE:
+            color = COLORS['BODY']
+
+        lines.setdefault(color, []).extend((tuple(head), tuple(tail)))
+        joints.extend((tuple(head), tuple(tail)))
+
+    batches = [(color, 'LINES', batch_for_shader(shader, 'LINES', {"pos": coords})) for color, coords in lines.items()]
+    if joints:
+        batches.append((CONNECTION_COLOR, 'POINTS', batch_for_shader(shader, 'POINTS', {"pos": joints})))
+    return batches
+
+
+def draw():
+    if not STATE.table:
+        return
+
+    shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
+    if STATE.batches is None:
+        STATE.batches = build_batches(shader)
+
+    bgl.glEnable(bgl.GL_DEPTH_TEST)
+    bgl.glLineWidth(3)
+    bgl.glPointSize(8)
+
+    shader.bind()
+    for color, _, batch in STATE.batches:
+        shader.uniform_float("color", color)
+        batch.draw(shader)
+
+    bgl.glPointSize(1)
+    bgl.glLineWidth(1)
+    bgl.glDisable(bgl.GL_DEPTH_TEST)
+
+# -------------------------------------------------------------------
+
+
+def enable(scene=None):
+    if STATE.draw_handle is None:
+        STATE.draw_handle = bpy.types.SpaceView3D.draw_handler_add(draw, (), 'WINDOW', 'POST_VIEW')
+    if scene is not None:
+        schedule(scene)
+
+
+def disable():
+    if STATE.draw_handle is not None:
+        bpy.types.SpaceView3D.draw_handler_remove(STATE.draw_handle, 'WINDOW')
+        STATE.draw_handle = None
+
+    STATE.components = {}
+    STATE.table = []
+    STATE.batches = None
+    STATE.full_cost = 0.0
+    STATE.light_updates = 0
+    STATE.cache.invalidate()
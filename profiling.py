@@ -0,0 +1,106 @@
+import time
+import json
+import functools
+import contextlib
+import tracemalloc
+from collections import deque
+
+# -------------------------------------------------------------------
+# Lightweight timing of the stages of every operator. An operator run
+# is opened by the `profiled` decorator around `execute`, the stages are
+# `with profiling.span("stage"):` blocks. When profiling is off, `span`
+# returns a shared no-op context manager and nothing is recorded.
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Profiler:
+
+    def __init__(self, history: int = 10):
+        self.runs = deque(maxlen=history)
+        self._run = None
+        self._depth = 0
+
+    def set_history(self, history: int):
+        if history != self.runs.maxlen:
+            self.runs = deque(self.runs, maxlen=history)
+
+    @contextlib.contextmanager
+    def run(self, name: str, track_memory: bool = False):
+        """Record one operator run and its spans"""
+        if self._run is not None:
+            # An operator called from another one is a stage of the outer run
+            with self._span(name) as record:
+                yield record
+            return
+
+        # Do not stop a trace started by someone else
+        track_memory = track_memory and not tracemalloc.is_tracing()
+        if track_memory:
+            tracemalloc.start()
+
+        self._run = {'operator': name, 'time': time.time(), 'spans': []}
+        self._depth = 0
+        start = time.perf_counter()
+        try:
+            yield self._run
+        finally:
+            self._run['seconds'] = time.perf_counter() - start
+            if track_memory:
+                self._run['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self.runs.append(self._run)
+            self._run = None
+
+    def span(self, name: str):
+        if self._run is None:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextlib.contextmanager
+    def _span(self, name: str):
+        record = {'name': name, 'depth': self._depth}
+        self._run['spans'].append(record)
+        track_memory = tracemalloc.is_tracing()
+        if track_memory:
+            memory = tracemalloc.get_traced_memory()[0]
+
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if track_memory:
+                record['allocated_bytes'] = tracemalloc.get_traced_memory()[0] - memory
+            self._depth -= 1
+
+    def clear(self):
+        self.runs.clear()
+
+    def export(self, filepath):
+        with open(filepath, 'w') as f:
+            f.write(json.dumps(list(self.runs), indent=2))
+
+
+PROFILER = Profiler()
+
+
+def span(name: str):
+    """Time a stage of the running operator (no-op when profiling is off)"""
+    return PROFILER.span(name)
+
+
+def profiled(execute):
+    """Decorator of `Operator.execute`, records a run when profiling is enabled in the scene"""
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        settings = context.scene.profiling_settings
+        if not settings.enabled:
+            return execute(self, context)
+
+        PROFILER.set_history(settings.history)
+        with PROFILER.run(self.bl_idname, track_memory=settings.track_memory):
+            return execute(self, context)
+
+    return wrapper
@@ -1,12 +1,16 @@
 import bpy
+import numpy as np
 
-from bpy.types import Scene, PropertyGroup
+from bpy.types import Scene, Object, PropertyGroup
 from bpy.props import (
     PointerProperty, BoolProperty, EnumProperty,
-    StringProperty, CollectionProperty, FloatProperty
+    StringProperty, CollectionProperty, FloatProperty, IntProperty
 )
 
-from .constants import MEMBERS_KEY
+from . import backend
+from . import preview
+from . import mesh_cache
+from .constants import MEMBERS_KEY, EIGEN_SOLVERS, SKINNING_MODES, REDUCTION_METHODS, CHAIN_SPLITS
 
 # -------------------------------------------------------------------
 # A property group can have custom methods attached to it for a more
@@ -14,27 +18,88 @@ from .constants import MEMBERS_KEY
 # are what is stored in .blend files but average() is used for display in panels
 # and add_sample() in operators. A property group can hence contain logic.
 
-# TODO : use the default bpy.props.FloatVectorProperty
 
+class MemberProperty(PropertyGroup):
 
-class FloatVectorProperty(PropertyGroup):
-    x: FloatProperty()
-    y: FloatProperty()
-    z: FloatProperty()
+    # member_type: EnumProperty(name="Member", items=MEMBERS_KEY) # Instantiated by default
 
-    def get(self) -> tuple:
-        return (self.x, self.y, self.z)
+    # Coordinates (`self["points"]`, float32) and vertex indices (`self["vertex_indices"]`,
+    # int32) are kept as packed ID property arrays: one block of raw bytes per member
+    # instead of one RNA item per point, in the .blend file as in the undo stack.
+    point_count: IntProperty(name="Points", default=0, min=0)
+    # Settings file the member still has to be read from (lazy loading), empty once loaded
+    source: StringProperty(name="Source", subtype='FILE_PATH')
+    # Fingerprint of the mesh coordinates the points were read from (`utils.get_coordinates_key`),
+    # empty when unknown: the stored moments are only used while it matches the mesh
+    coordinates_key: StringProperty(name="Coordinates Key", options={'HIDDEN'})
 
-    def set(self, value: tuple):
-        self.x = value[0]
-        self.y = value[1]
-        self.z = value[2]
+    def is_loaded(self) -> bool:
+        return not self.source
 
+    def get_points(self) -> np.ndarray:
+        if "points" not in self and "points_cloud" in self:
+            # Members saved when every point was a PropertyGroup item
+            legacy = self["points_cloud"]
+            self.set_points([(point.get("x", 0), point.get("y", 0), point.get("z", 0)) for point in legacy])
+            del self["points_cloud"]
 
-class MemberProperty(PropertyGroup):
+        return self._get_array("points", np.float32).reshape(-1, 3)
 
-    # member_type: EnumProperty(name="Member", items=MEMBERS_KEY) # Instantiated by default
-    points_cloud: CollectionProperty(type=FloatVectorProperty)
+    def set_points(self, value, statistics=None, coordinates_key: str = ""):
+        points = np.asarray(value, dtype=np.float32).reshape(-1, 3)
+        self._set_array("points", points.ravel())
+        self.point_count = len(points)
+        self.coordinates_key = coordinates_key
+
+        # Moments of the points, rebuilt on demand when not given
+        if statistics is not None:
+            self._set_array("statistics", statistics.to_array())
+        elif "statistics" in self:
+            del self["statistics"]
+
+    def get_statistics(self):
+        """Count, mean and co-moment of the points (`backend.Moments`)"""
+        if len(self.get("statistics", ())) != backend.Moments.SIZE:
+            # Not computed yet, or saved in an older layout
+            self._set_array("statistics", backend.Moments.of(self.get_points()).to_array())
+        return backend.Moments.from_array(self._get_array("statistics", np.float64))
+
+    def has_indices(self) -> bool:
+        return "vertex_indices" in self
+
+    def get_indices(self) -> np.ndarray:
+        return self._get_array("vertex_indices", np.int32)
+
+    def set_indices(self, value):
+        self._set_array("vertex_indices", np.asarray(value, dtype=np.int32))
+
+    def copy_from(self, other):
+        if "points_cloud" in other:
+            other.get_points()  # legacy member
+
+        self.name = other.name
+        self.source = other.source
+        self.point_count = other.point_count
+        self.coordinates_key = other.coordinates_key
+        for key, dtype in (("points", np.float32), ("vertex_indices", np.int32), ("statistics", np.float64)):
+            if key in other:
+                self._set_array(key, other._get_array(key, dtype))
+            elif key in self:
+                del self[key]
+
+    def _get_array(self, key, dtype) -> np.ndarray:
+        """Copy a packed ID property array into a NumPy array (one memcpy through the buffer protocol)"""
+        value = self.get(key)
+        if value is None or len(value) == 0:
+            return np.empty(0, dtype=dtype)
+        # A view would write into the ID property without any RNA update nor undo push, and would
+        # point to freed memory once the property is assigned again
+        return np.array(value, dtype=dtype)
+
+    def _set_array(self, key, value):
+        # Only `_set_array` (through `set_points`, `set_indices`) writes the arrays of a member.
+        # ID properties are built straight from the buffer of contiguous arrays
+        self[key] = np.ascontiguousarray(value) if len(value) else []
 
 # -------------------------------------------------------------------
 
@@ -50,8 +115,171 @@ class SelectionStateProperty(PropertyGroup):
 # -------------------------------------------------------------------
 
 
+class GenerationSettingsProperty(PropertyGroup):
+
+    single_pass: BoolProperty(
+        name="Single Pass",
+        description="Compute the statistics of all members in one segmented pass over a labelled points cloud",
+        default=True,
+    )
+    eigen_solver: EnumProperty(name="Eigen Solver", items=EIGEN_SOLVERS, default='EIGH')
+    max_iterations: IntProperty(
+        name="Max Iterations",
+        description="Upper bound of iterations for the power iteration solver",
+        default=100, min=1,
+    )
+    tolerance: FloatProperty(
+        name="Tolerance",
+        description="Relative change of the Rayleigh quotient under which the power iteration stops",
+        default=1e-12, min=0,
+    )
+
+    trim: FloatProperty(
+        name="Trim (%)",
+        description="Percentage of points ignored at each end of a member when searching its extremities",
+        default=0, min=0, max=25,
+    )
+    use_vertex_groups: BoolProperty(
+        name="Vertex Groups",
+        description="Mirror every member into a vertex group of the active mesh",
+        default=False,
+    )
+
+    reduction: EnumProperty(
+        name="Reduction",
+        description="Estimate the axes on a subset of the points, the extremities still come from every point",
+        items=REDUCTION_METHODS, default='NONE',
+    )
+    sample_size: IntProperty(
+        name="Sample Size",
+        description="Number of points per member kept by the reduction",
+        default=10000, min=100,
+    )
+    report_reduction_error: BoolProperty(
+        name="Report Error",
+        description="Report the angle between the reduced and the full data axes (reads every point again)",
+        default=False,
+    )
+
+    chain_bones: IntProperty(
+        name="Limb Bones",
+        description="Number of bones of every arm and leg",
+        default=1, min=1, max=8,
+    )
+    chain_split: EnumProperty(name="Split", items=CHAIN_SPLITS, default='ADAPTIVE')
+
+    skinning: EnumProperty(name="Skinning", items=SKINNING_MODES, default='HEAT')
+    influences: IntProperty(
+        name="Influences",
+        description="Number of nearest bones sharing a vertex outside of the members",
+        default=2, min=1, max=4,
+    )
+
+    def snapshot(self) -> dict:
+        """Plain copy of the settings, readable outside of the main thread"""
+        return {
+            'single_pass': self.single_pass,
+            'generation': self.generation_options(),
+            'chain_bones': self.chain_bones,
+            'chain_split': self.chain_split,
+            'skinning': self.skinning,
+            'influences': self.influences,
+        }
+
+    def generation_options(self) -> dict:
+        return {
+            'trim': self.trim,
+            'solver': self.eigen_solver,
+            'max_iterations': self.max_iterations,
+            'tolerance': self.tolerance,
+            'reduction': self.reduction,
+            'sample_size': self.sample_size,
+        }
+
+# -------------------------------------------------------------------
+
+
+class ProfilingSettingsProperty(PropertyGroup):
+
+    enabled: BoolProperty(
+        name="Profiling",
+        description="Time every stage of the operators (no cost when disabled)",
+        default=False,
+    )
+    track_memory: BoolProperty(
+        name="Track Memory",
+        description="Also record the peak memory of every run with tracemalloc (slower)",
+        default=False,
+    )
+    history: IntProperty(name="History", description="Number of runs kept", default=10, min=1, max=100)
+
+# -------------------------------------------------------------------
+
+
+def update_preview(self, context):
+    if self.enabled:
+        preview.enable(context.scene)
+    else:
+        preview.disable()
+
+
+class PreviewSettingsProperty(PropertyGroup):
+
+    enabled: BoolProperty(
+        name="Preview",
+        description="Draw the predicted bones in the 3D view while the members are edited",
+        default=False, update=update_preview,
+    )
+    debounce: FloatProperty(
+        name="Delay",
+        description="Seconds between a change of the mesh and the update of the preview",
+        default=0.1, min=0.01, max=2, subtype='TIME', unit='TIME',
+    )
+    budget: FloatProperty(
+        name="Budget (ms)",
+        description="Time an update may take, slower updates are spaced out so the viewport keeps its frame rate",
+        default=8, min=1, max=100,
+    )
+
+# -------------------------------------------------------------------
+
+
+def copy_members(source, destination):
+    destination.clear()
+    for member in source:
+        destination.add().copy_from(member)
+
+
+def store_members(scene):
+    """Copy the members of the scene into the mesh they belong to"""
+    owner = bpy.data.objects.get(scene.members_owner or scene.active_mesh)
+    if owner is not None:
+        copy_members(scene.selected_members, owner.bone_generator_members)
+
+
+def update_active_mesh(self, context):
+    """The members of the scene are the ones of the active mesh, every mesh keeps its own"""
+    previous = bpy.data.objects.get(self.members_owner)
+    if previous is not None:
+        copy_members(self.selected_members, previous.bone_generator_members)
+
+    current = bpy.data.objects.get(self.active_mesh)
+    if current is not None:
+        copy_members(current.bone_generator_members, self.selected_members)
+    else:
+        self.selected_members.clear()
+
+    self.members_owner = self.active_mesh
+
+    # The first operator on the new target should not pay the extraction of its arrays
+    mesh_cache.warm(current, self.use_mesh_cache_sidecar)
+
+# -------------------------------------------------------------------
+
+
 classes = (
-    FloatVectorProperty, MemberProperty, SelectionStateProperty,
+    MemberProperty, SelectionStateProperty, GenerationSettingsProperty, ProfilingSettingsProperty,
+    PreviewSettingsProperty,
 )
 register_cls, unregister_cls = bpy.utils.register_classes_factory(classes)
 
@@ -61,9 +289,19 @@ def register():
 
     # Add properties to all scenes
     Scene.active_member_type = EnumProperty(name="Member", items=MEMBERS_KEY)
-    Scene.active_mesh = StringProperty(name="Target")  # Normally is a Human model
+    Scene.active_mesh = StringProperty(name="Target", update=update_active_mesh)  # Normally is a Human model
+    Scene.members_owner = StringProperty(name="Members Owner", options={'HIDDEN'})
+    Scene.use_mesh_cache_sidecar = BoolProperty(
+        name="Cache Files",
+        description="Save the spatial index of the target next to the .blend file, to reuse it when the file is opened again",
+        default=False,
+    )
     Scene.selected_members = CollectionProperty(name="Members", type=MemberProperty)
+    Object.bone_generator_members = CollectionProperty(name="Members", type=MemberProperty)
     Scene.selection_state = PointerProperty(type=SelectionStateProperty)
+    Scene.generation_settings = PointerProperty(type=GenerationSettingsProperty)
+    Scene.profiling_settings = PointerProperty(type=ProfilingSettingsProperty)
+    Scene.preview_settings = PointerProperty(type=PreviewSettingsProperty)
 
 
 def unregister():
@@ -71,5 +309,11 @@ def unregister():
 
     del Scene.active_member_type
     del Scene.active_mesh
+    del Scene.members_owner
+    del Scene.use_mesh_cache_sidecar
     del Scene.selected_members
+    del Object.bone_generator_members
     del Scene.selection_state
+    del Scene.generation_settings
+    del Scene.profiling_settings
+    del Scene.preview_settings
@@ -0,0 +1,237 @@
+import bpy
+import numpy as np
+
+from . import backend
+from . import utils
+
+# -------------------------------------------------------------------
+# Armatures are built straight from `bpy.data`, without `armature_add`
+# nor `bpy.context.active_bone`: the bones are first described by a
+# table of (name, head, tail, parent) computed from the principal
+# components, then created in a single edit session. This also works
+# in background mode and for many armatures at once.
+
+MIN_BONE_LENGTH = 1e-4  # Blender deletes zero length bones when leaving edit mode
+BODY_BONE = 'Bone'  # name given by `armature_add`, kept for the existing rigs
+
+
+def bone_name(key: str, index: int = 0, count: int = 1) -> str:
+    if key == 'BODY':
+        return BODY_BONE
+    return f'Bone{key}' if count == 1 else f'Bone{key}.{index:03d}'
+
+
+def orient_chain(points, attach) -> np.ndarray:
+    """Helper to order the joints of a member from the end nearest to `attach`"""
+    points = np.asarray(points, dtype=np.float64)
+    if attach is not None and np.linalg.norm(points[-1] - attach) < np.linalg.norm(points[0] - attach):
+        points = points[::-1]
+    return points
+
+
+def build_bone_table(principal_components: dict) -> list:
+    """Describe the skeleton as a list of (name, head, tail, parent), parents first.
+
+    The body goes upward; the legs hang from the bottom of the body, the head
+    and the arms from its top, each one through a `_Raccordement` bone.
+    """
+    table = []
+    body_head = body_tail = None
+
+    if 'BODY' in principal_components:
+        body = np.asarray(principal_components['BODY'], dtype=np.float64)
+        body = body if body[0][2] <= body[-1][2] else body[::-1]
+        body_head, body_tail = body[0], body[-1]
+        table.append((bone_name('BODY'), body_head, body_tail, None))
+
+    for key, points in principal_components.items():
+        if key == 'BODY':
+            continue
+
+        # Attachment point on the body
+        if body_head is None:
+            attach = None
+        elif 'LEG' in key:
+            attach = body_head
+        elif key == 'HEAD' or 'ARM' in key:
+            attach = body_tail
+        else:
+            # Custom member : the nearest end of the body
+            first = np.asarray(points[0], dtype=np.float64)
+            attach = min((body_head, body_tail), key=lambda end: np.linalg.norm(first - end))
+
+        joints = orient_chain(points, attach)
+        parent = None
+
+        if attach is not None:
+            parent = f'Bone{key}_Raccordement'
+            table.append((parent, attach, joints[0], BODY_BONE))
+
+        count = len(joints) - 1
+        for i in range(count):
+            name = bone_name(key, i, count)
+            table.append((name, joints[i], joints[i + 1], parent))
+            parent = name
+
+    return table
+
+# -------------------------------------------------------------------
+
+
+def new_armature(name: str, collection=None):
+    """Create an empty armature object linked to `collection` (the scene collection by default)"""
+    data = bpy.data.armatures.new(name)
+    obj = bpy.data.objects.new(name, data)
+
+    if collection is None:
+        collection = bpy.context.scene.collection
+    collection.objects.link(obj)
+
+    return obj
+
+
+def build_bones(armatures: list):
+    """Create the bones of many (armature object, bone table) in a single edit session.
+
+    The armatures are left selected, the first one active, in object mode.
+    """
+    if not armatures:
+        return
+
+    view_layer = bpy.context.view_layer
+    utils.require_mode('OBJECT')
+
+    for obj in view_layer.objects.selected:
+        obj.select_set(False)
+    for obj, _ in armatures:
+        obj.select_set(True)
+    view_layer.objects.active = armatures[0][0]
+
+    # Multi-object edit mode : one switch for every armature
+    utils.require_mode('EDIT')
+
+    for obj, table in armatures:
+        edit_bones = obj.data.edit_bones
+
+        for name, head, tail, parent in table:
+            head = np.asarray(head, dtype=np.float64)
+            tail = np.asarray(tail, dtype=np.float64)
+            if np.linalg.norm(tail - head) < MIN_BONE_LENGTH:
+                tail = head + (0, 0, MIN_BONE_LENGTH)
+
+            bone = edit_bones.new(name=name)
+            bone.head = head.tolist()
+            bone.tail = tail.tolist()
+
+            if parent is not None:
+                bone.use_relative_parent = True
+                bone.parent = edit_bones[parent]
+
+    utils.require_mode('OBJECT')
+
+
+def create_armatures(tables: list, collection=None) -> list:
+    """Create one armature object per (name, bone table)"""
+    armatures = [(new_armature(name, collection), table) for name, table in tables]
+    build_bones(armatures)
+
+    return [obj for obj, _ in armatures]
+
+
+def create_armature(name: str, table: list, collection=None):
+    return create_armatures([(name, table)], collection)[0]
+
+# -------------------------------------------------------------------
+# Member based skinning, a fast alternative to `parent_set(type='ARMATURE_AUTO')`
+
+
+def write_weights(obj, name: str, indices, weights, levels: int = 256):
+    """Write the weights of a vertex group in bulk.
+
+    `VertexGroup.add` takes one weight for many vertices, so the weights are
+    quantized to `levels` values and written with one call per value.
+    """
+    group = obj.vertex_groups.get(name)
+    if group is not None:
+        obj.vertex_groups.remove(group)  # weights of a previous generation
+    group = obj.vertex_groups.new(name=name)
+
+    quantized = np.rint(np.asarray(weights) * (levels - 1)).astype(np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+
+    for level in np.unique(quantized):
+        if level == 0:
+            continue
+        group.add(indices[quantized == level].tolist(), level / (levels - 1), 'REPLACE')
+
+    return group
+
+
+def bind_armature(obj, armature):
+    """Parent `obj` to `armature` with an Armature modifier, keeping its transform"""
+    obj.parent = armature
+    obj.matrix_parent_inverse = armature.matrix_world.inverted()
+
+    modifier = next((m for m in obj.modifiers if m.type == 'ARMATURE'), None)
+    if modifier is None:
+        modifier = obj.modifiers.new(name=armature.name, type='ARMATURE')
+    modifier.object = armature
+
+
+def compute_member_weights(table: list, coordinates, member_indices: dict, **options) -> list:
+    """(bone name, vertex indices, weights) of every bone : each member goes to its bone,
+    the rest falls off with the distance. NumPy only, safe to run in a worker thread."""
+    names = [row[0] for row in table]
+    heads = np.array([row[1] for row in table], dtype=np.float64)
+    tails = np.array([row[2] for row in table], dtype=np.float64)
+
+    assignment = np.full(len(coordinates), -1, dtype=np.int64)
+    for key, indices in member_indices.items():
+        bones = [i for i, name in enumerate(names) if name == bone_name(key) or name.startswith(f'Bone{key}.')]
+        if len(bones) == 1:
+            assignment[indices] = bones[0]
+        elif bones:
+            # Chain : the nearest bone of the member
+            distances = backend.segment_distances(coordinates[indices], heads[bones], tails[bones])
+            assignment[indices] = np.asarray(bones)[np.argmin(distances, axis=1)]
+
+    weights = backend.compute_skin_weights(coordinates, heads, tails, assignment, **options)
+    return [(name, indices, bone_weights) for name, (indices, bone_weights) in zip(names, weights)]
+
+
+def write_skin(obj, armature, weights: list):
+    for name, indices, bone_weights in weights:
+        write_weights(obj, name, indices, bone_weights)
+
+    bind_armature(obj, armature)
+
+
+def skin_members(obj, armature, table: list, coordinates, member_indices: dict, **options):
+    """Weight `obj` from its members, a fast alternative to the heat diffusion"""
+    write_skin(obj, armature, compute_member_weights(table, coordinates, member_indices, **options))
+
+# -------------------------------------------------------------------
+
+
+def compute_skeleton(cache, members: dict, settings: dict, weights: dict = None, moments: dict = None) -> tuple:
+    """(principal components, bone table) of a target from its members and a settings snapshot.
+
+    `moments` holds the stored moments of the members still matching their points (see
+    `utils.get_members_moments`). NumPy only (no bpy access) : the skeletons of many
+    targets are computed in worker threads.
+    """
+    principal_components = backend.compute_bones_generation_cached(
+        cache, members, settings['single_pass'], weights, moments, **settings['generation']
+    )
+
+    if settings['chain_bones'] > 1:
+        # Les bras et les jambes deviennent des chaînes d'os (coude, genou), gardées en cache
+        # comme les composantes principales : seuls les membres modifiés sont réajustés
+        generation = settings['generation']
+        limbs = {key: settings['chain_bones'] for key in principal_components if 'ARM' in key or 'LEG' in key}
+        principal_components.update(backend.compute_chains_cached(
+            cache, members, limbs, settings['chain_split'], generation['trim'],
+            solver=generation['solver'], max_iterations=generation['max_iterations'], tolerance=generation['tolerance'],
+        ))
+
+    return principal_components, build_bone_table(principal_components)
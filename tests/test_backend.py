@@ -0,0 +1,165 @@
+"""Tests of the backend math and of the settings file formats, in plain CPython (no Blender needed): python -m pytest
+
+The pytest.ini at the root keeps pytest from importing the add-on package (and bpy).
+"""
+
+import os
+import importlib.util
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_module(name):
+    """Load a module of the add-on on its own, without importing the add-on package (and bpy)"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, f'{name}.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+backend = import_module('backend')
+formats = import_module('formats')
+
+
+def synthetic_member(size: int, seed: int = 0) -> np.ndarray:
+    """Noisy segment along a random direction, with a few stray points"""
+    rng = np.random.default_rng(seed)
+    direction = rng.normal(size=3)
+    points = rng.uniform(-1, 1, (size, 1)) * direction + rng.normal(scale=0.05, size=(size, 3))
+    points[:size // 50] += rng.normal(scale=2.0, size=(size // 50, 3))
+    return points + rng.normal(size=3)
+
+
+MEMBERS = {'HEAD': synthetic_member(300, 1), 'BODY': synthetic_member(1000, 2), 'EMPTY': np.empty((0, 3)),
+           'LEFT ARM': synthetic_member(500, 3)}
+
+
+def test_power_iteration_column_orthogonal_to_dominant_axis():
+    # The largest column of M is e3, orthogonal to the dominant eigenvector v1
+    v1 = np.array([1.0, 1.0, 0.0]) / np.sqrt(2)
+    e3 = np.array([0.0, 0.0, 1.0])
+    M = np.outer(v1, v1) + 0.99 * np.outer(e3, e3)
+
+    for solver in ('EIGH', 'POWER'):
+        eigenvalues, axes, _ = backend.compute_principal_axes(M, solver=solver)
+        assert np.isclose(eigenvalues[0], 1.0)
+        assert np.allclose(axes[0], v1)
+
+# -------------------------------------------------------------------
+# Moments
+
+
+def assert_moments_equal(moments, expected):
+    assert np.isclose(moments.count, expected.count)
+    assert np.allclose(moments.mean, expected.mean)
+    assert np.allclose(moments.comoment, expected.comoment)
+
+
+def test_moments_merge_matches_whole_cloud():
+    points = synthetic_member(1000)
+
+    for split in (0, 1, 400, 999, 1000):
+        merged = backend.Moments.of(points[:split]).merge(backend.Moments.of(points[split:]))
+        assert_moments_equal(merged, backend.Moments.of(points))
+
+
+def test_moments_subtract_is_inverse_of_merge():
+    points = synthetic_member(1000)
+    whole = backend.Moments.of(points)
+
+    for split in (1, 400, 999):
+        assert_moments_equal(whole.remove(points[split:]), backend.Moments.of(points[:split]))
+        assert_moments_equal(whole.remove(points[:split]), backend.Moments.of(points[split:]))
+
+    assert whole.remove(points).count == 0
+
+
+def test_moments_of_intervals_and_prefix():
+    points = synthetic_member(1000)
+    bounds = [0, 100, 100, 650, 1000]
+
+    intervals = backend.Moments.of_intervals(points, bounds)
+    prefix = intervals.prefix()
+    for k in range(len(bounds) - 1):
+        assert_moments_equal(intervals[k], backend.Moments.of(points[bounds[k]:bounds[k + 1]]))
+        assert_moments_equal(prefix[k + 1], backend.Moments.of(points[:bounds[k + 1]]))
+
+# -------------------------------------------------------------------
+# Equivalence of the computation paths
+
+
+def assert_components_equal(components, expected):
+    assert components.keys() == expected.keys()
+    for key in expected:
+        assert np.allclose(components[key], expected[key])
+
+
+@pytest.mark.parametrize('trim', [0.0, 2.5])
+def test_streaming_matches_in_memory(trim):
+    expected = backend.compute_bones_generation(None, MEMBERS, trim)
+
+    for chunk_size in (64, 65536):
+        components = backend.compute_bones_generation_streaming(MEMBERS, trim, chunk_size)
+        assert_components_equal(components, expected)
+
+
+@pytest.mark.parametrize('trim', [0.0, 2.5])
+def test_segmented_matches_per_member(trim):
+    expected = backend.compute_bones_generation(None, MEMBERS, trim)
+
+    keys, points, labels = backend.concatenate_members(MEMBERS)
+    assert_components_equal(backend.compute_bones_generation_segmented(points, labels, keys, trim), expected)
+
+    # Unsorted labels
+    order = np.random.default_rng(0).permutation(len(points))
+    assert_components_equal(backend.compute_bones_generation_segmented(points[order], labels[order], keys, trim),
+                            expected)
+
+# -------------------------------------------------------------------
+# Settings files
+
+
+def test_binary_file_round_trip(tmp_path):
+    data = {
+        'HEAD': {'points': MEMBERS['HEAD'], 'indices': np.arange(300)},
+        'BODY': {'points': MEMBERS['BODY'], 'indices': None},
+        'EMPTY': {'points': MEMBERS['EMPTY'], 'indices': np.empty(0, np.int32)},
+    }
+    settings = formats.BinaryFile(str(tmp_path / 'settings.bgen'))
+    settings.write(data)
+
+    assert settings.read_header() == {'HEAD': 300, 'BODY': 1000, 'EMPTY': 0}
+
+    read = settings.read()
+    assert read.keys() == data.keys()
+    for name, value in data.items():
+        assert np.array_equal(read[name]['points'], value['points'].astype(np.float32))
+        if value['indices'] is None:
+            assert read[name]['indices'] is None
+        else:
+            assert np.array_equal(read[name]['indices'], value['indices'])
+
+    assert np.array_equal(settings.read_member('BODY')['points'], read['BODY']['points'])
+    with pytest.raises(KeyError):
+        settings.read_member('TAIL')
+
+
+@pytest.mark.parametrize('size', [0, 6, 12, 40, -8])
+def test_binary_file_truncated(tmp_path, size):
+    filepath = tmp_path / 'settings.bgen'
+    formats.BinaryFile(str(filepath)).write({'HEAD': {'points': MEMBERS['HEAD'], 'indices': np.arange(300)}})
+    filepath.write_bytes(filepath.read_bytes()[:size])
+
+    with pytest.raises(IOError):
+        formats.BinaryFile(str(filepath)).read()
+
+
+def test_json_file_round_trip(tmp_path):
+    settings = formats.JSONFile(str(tmp_path / 'settings.json'))
+    settings.write({'HEAD': {'points': MEMBERS['HEAD'], 'indices': None}})
+
+    assert settings.read_header() == {'HEAD': 300}
+    assert np.allclose(settings.read_member('HEAD')['points'], MEMBERS['HEAD'], atol=1e-6)
@@ -1,7 +1,14 @@
 import os
 import bpy
-import json
+import bmesh
 import random
+import functools
+import contextlib
+import numpy as np
+
+from .constants import COLORS
+from . import mesh_cache
+from . import formats
 
 # -------------------------------------------------------------------
 
@@ -11,7 +18,7 @@ def setup_selection_state(context):
     object_name = context.scene.active_mesh
     set_context_obj(object_name, 'MESH')
     mode_set('EDIT')
-    bpy.ops.mesh.select_mode(type="VERT")
+    context.tool_settings.mesh_select_mode = (True, False, False)
     
     # TODO : reactive xray -> lasso -> viewport shading
     # set_xray(True) 
@@ -32,31 +39,133 @@ def setup_selection_state(context):
 def back_to_normal_state(context):
     """Go to normal state for the View3D"""
     # set_xray(False)
-    mode_set('EDIT')
-    bpy.ops.mesh.select_all(action='DESELECT')
-    mode_set('OBJECT')
-    bpy.ops.object.select_all(action='DESELECT')
+    require_mode('OBJECT')
+
+    # Deselect the mesh data directly, without going through the edit mode
+    mesh = bpy.data.objects[context.scene.active_mesh].data
+    for elements in (mesh.vertices, mesh.edges, mesh.polygons):
+        elements.foreach_set('select', np.zeros(len(elements), dtype=bool))
+    mesh.update()
+
+    for obj in context.view_layer.objects.selected:
+        obj.select_set(False)
 
 # -------------------------------------------------------------------
 
 
-def mode_set(mode='OBJECT'):
-    """Helper to change mode"""
-    # Crash if the same mode is already set
+def select_vertices(obj, indices):
+    """Select exactly the given vertices of a mesh (object mode), with the edges and faces between them"""
+    mesh = obj.data
+
+    selected = np.zeros(len(mesh.vertices), dtype=bool)
+    indices = np.asarray(indices, dtype=np.int64)
+    selected[indices[indices < len(selected)]] = True
+    mesh.vertices.foreach_set('select', selected)
+
+    edge_vertices = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get('vertices', edge_vertices)
+    mesh.edges.foreach_set('select', selected[edge_vertices].reshape(-1, 2).all(axis=1))
+
+    # A face is selected when all its corners are
+    data = mesh_cache.get(mesh)
+    corners = selected[data.loop_vertices].astype(np.int32)
+    if len(data.polygon_offsets) > 1:
+        loop_starts = data.polygon_offsets[:-1]
+        mesh.polygons.foreach_set('select', np.add.reduceat(corners, loop_starts) == np.diff(data.polygon_offsets))
+
+    mesh.update()
+
+# -------------------------------------------------------------------
+# Every mode switch flushes the edit data between bmesh and the mesh,
+# an O(mesh) cost. Inside a `mode_scope` (opened by the `mode_scoped`
+# decorator around `Operator.execute`), `mode_set` only records the
+# requested mode: Blender switches when a helper needs the data of a
+# mode (`require_mode`) and once more, to the last requested mode, when
+# the scope ends.
+
+
+class ModeScope:
+
+    def __init__(self):
+        self.requested = None
+
+
+_mode_scope = None
+
+
+def current_mode() -> str:
+    obj = bpy.context.view_layer.objects.active
+    return obj.mode if obj is not None else 'OBJECT'
+
+
+def _switch_mode(mode):
+    if current_mode() == mode:
+        return
+    # Crash if the mode can not be set (e.g. no active object)
     try:
         bpy.ops.object.mode_set(mode=mode)
     except RuntimeError:
         pass
 
+
+def mode_set(mode='OBJECT'):
+    """Helper to change mode, deferred to the end of the running mode scope"""
+    if _mode_scope is not None:
+        _mode_scope.requested = mode
+    else:
+        _switch_mode(mode)
+
+
+def require_mode(mode='OBJECT'):
+    """Helper to switch right now, for the helpers which need the data of `mode`"""
+    if _mode_scope is not None:
+        _mode_scope.requested = mode
+    _switch_mode(mode)
+
+
+@contextlib.contextmanager
+def mode_scope():
+    """Collapse the mode switches of a block into the needed ones"""
+    global _mode_scope
+
+    if _mode_scope is not None:
+        # Nested scope (operator called from another one)
+        yield _mode_scope
+        return
+
+    _mode_scope = scope = ModeScope()
+    try:
+        yield scope
+    finally:
+        _mode_scope = None
+        if scope.requested is not None:
+            _switch_mode(scope.requested)
+
+
+def mode_scoped(execute):
+    """Decorator of `Operator.execute`, runs it in a mode scope"""
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        with mode_scope():
+            return execute(self, context)
+
+    return wrapper
+
 # -------------------------------------------------------------------
 
 
 def set_context_obj(object_name, object_type):
     """Helper to define active object"""
-    mode_set(mode='OBJECT')
-    bpy.ops.object.select_all(action='DESELECT')
-    bpy.context.view_layer.objects.active = bpy.data.objects[object_name]
-    bpy.ops.object.select_by_type(type=object_type)
+    require_mode(mode='OBJECT')
+
+    view_layer = bpy.context.view_layer
+    for obj in view_layer.objects.selected:
+        obj.select_set(False)
+    view_layer.objects.active = bpy.data.objects[object_name]
+
+    for obj in view_layer.objects:
+        if obj.type == object_type:
+            obj.select_set(True)
 
 # -------------------------------------------------------------------
 
@@ -71,62 +180,251 @@ def set_xray(state):
 # -------------------------------------------------------------------
 
 
-def get_vertices(context, method: str = 'SELECTED', member=None) -> list:
-    valid_method = ['SELECTED', 'ALL', 'MEMBER']
+def get_selection_mask(mesh) -> np.ndarray:
+    """Helper to get the selection state of every vertex of a mesh as a boolean array"""
+    if mesh.is_editmode:
+        # Read the edit data directly, the mesh is only updated when leaving the edit mode
+        verts = bmesh.from_edit_mesh(mesh).verts
+        return np.fromiter((v.select for v in verts), dtype=bool, count=len(verts))
 
-    if method == 'MEMBER' and member is None:
-        raise 'get_vertices call with MEMBER method, need to specify a valid member'
+    mask = np.empty(len(mesh.vertices), dtype=bool)
+    mesh.vertices.foreach_get('select', mask)
 
-    mode_set(mode='OBJECT')
+    return mask
 
-    selected_verts = []
-    obj = bpy.data.objects[context.scene.active_mesh]
+# -------------------------------------------------------------------
+
+
+def get_coordinates(obj, indices=None, world: bool = True, flush: bool = True) -> np.ndarray:
+    """Helper to get the (world space) coordinates of the vertices of a mesh object as a (N, 3) array"""
     mesh = obj.data
+    if mesh.is_editmode:
+        if flush:
+            flush_edit_data(obj)
 
-    if method == 'MEMBER':
-        matrix_world = obj.matrix_world
-        points_cloud = [point.get() for point in member.points_cloud]
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get('co', co)
+        co = co.reshape(-1, 3)
+    else:
+        # Cached copy, never modified in place
+        co = mesh_cache.get(mesh).co
+        if indices is None and not world:
+            co = co.copy()
+
+    if indices is not None:
+        co = co[np.asarray(indices, dtype=np.int64)]
 
-        for vert in mesh.vertices:
-            world_co = matrix_world @ vert.co
-            if (world_co[0], world_co[1], world_co[2]) in points_cloud:
-                selected_verts.append(vert)
+    if world:
+        # Apply the 4x4 world matrix to every point at once
+        matrix_world = np.array(obj.matrix_world, dtype=np.float32)
+        co = co @ matrix_world[:3, :3].T + matrix_world[:3, 3]
+
+    return co
+
+
+def flush_edit_data(obj):
+    """Helper to write the edit data into the mesh, without leaving the edit mode"""
+    obj.update_from_editmode()
+    mesh_cache.invalidate(obj.data.name)
+
+
+def get_coordinates_key(obj) -> str:
+    """Helper to get a fingerprint of the current world coordinates of a mesh object (see `get_coordinates`)"""
+    return mesh_cache.get(obj.data).key(obj.matrix_world)
+
+# -------------------------------------------------------------------
+
+
+def get_vertex_indices(context, method: str = 'SELECTED', member=None) -> np.ndarray:
+    """Helper to get the indices of the vertices of the active mesh matching `method`"""
+    if method == 'MEMBER' and member is None:
+        raise ValueError('get_vertex_indices call with MEMBER method, need to specify a valid member')
+
+    mesh = bpy.data.objects[context.scene.active_mesh].data
+
+    if method == 'MEMBER':
+        indices = get_member_indices(context, member)
+        return indices[indices < len(mesh.vertices)]
     elif method == 'SELECTED':
-        for vert in mesh.vertices:
-            if vert.select:
-                selected_verts.append(vert)
+        return np.flatnonzero(get_selection_mask(mesh))
     elif method == 'ALL':
-        for vert in mesh.vertices:
-            selected_verts.append(vert)
-    else: 
-        raise 'get_vertices call with bad method'
+        return np.arange(len(mesh.vertices))
+    else:
+        raise ValueError('get_vertex_indices call with bad method')
+
+# -------------------------------------------------------------------
+
+
+def get_member_points(context, member) -> np.ndarray:
+    """Helper to get the current world space coordinates of a member of the active mesh.
+
+    When its indices are missing or partial (settings file of another mesh, deleted
+    vertices), the stored points of the member are returned instead.
+    """
+    obj = bpy.data.objects[context.scene.active_mesh]
+    indices = get_vertex_indices(context, 'MEMBER', member=member)
+
+    if len(indices) < member.point_count:
+        return member.get_points()
+    return get_coordinates(obj, indices)
+
+
+def get_members_points(context) -> dict:
+    """Helper to get the current world space coordinates of every member of the active mesh"""
+    return {member.name: get_member_points(context, member) for member in context.scene.selected_members}
 
-    return selected_verts
+
+def get_members_moments(obj, members) -> dict:
+    """Helper to get the stored moments of the members whose points are still the current coordinates of `obj`"""
+    key = get_coordinates_key(obj)
+
+    return {
+        member.name: member.get_statistics() for member in members
+        if member.is_loaded() and member.coordinates_key == key
+        and len(member.get("vertex_indices", ())) == member.point_count
+    }
+
+
+def get_object_members_indices(obj) -> dict:
+    """Helper to get the vertex indices of the members stored in any mesh object.
+
+    Members still in their settings file (the mesh was never opened in the editor) are
+    loaded first, the ones that cannot be read are left out of the result.
+    """
+    members = {}
+    sources = set()
+
+    for member in obj.bone_generator_members:
+        if not member.is_loaded():
+            sources.add(member.source)
+            if not read_lazy_member(member, obj):
+                continue
+        if not member.has_indices():
+            member.set_indices(match_vertex_indices(obj, member.get_points()))
+
+        indices = member.get_indices()
+        members[member.name] = indices[indices < len(obj.data.vertices)]
+
+    for filepath in sources:
+        release_lazy_loader(filepath)
+
+    return members
 
 # -------------------------------------------------------------------
 
 
-def color_to_vertices(context, vertices, color):
-    mode_set(mode='OBJECT')
-    mesh = bpy.data.objects[context.scene.active_mesh].data
-    mode_set(mode='VERTEX_PAINT')
+def get_vertex_areas(obj) -> np.ndarray:
+    """Helper to get the area around every vertex of a mesh, a share of each polygon it belongs to"""
+    mesh = obj.data
+
+    areas = np.empty(len(mesh.polygons), dtype=np.float64)
+    mesh.polygons.foreach_get('area', areas)
+    loop_totals = np.diff(mesh_cache.get(mesh).polygon_offsets)
+
+    # Polygon area spread evenly over its corners
+    loop_areas = np.repeat(areas / np.maximum(loop_totals, 1), loop_totals)
+    return np.bincount(get_loop_vertices(mesh), weights=loop_areas, minlength=len(mesh.vertices))
+
+
+def get_members_areas(context) -> dict:
+    """Helper to get the vertex areas of every member of the active mesh"""
+    obj = bpy.data.objects[context.scene.active_mesh]
+    areas = get_vertex_areas(obj)
+
+    members = {}
+    for member in context.scene.selected_members:
+        indices = get_vertex_indices(context, 'MEMBER', member=member)
+        # No areas for the members falling back to their stored points (see `get_member_points`)
+        if len(indices) >= member.point_count:
+            members[member.name] = areas[indices]
+
+    return members
+
+# -------------------------------------------------------------------
+
 
-    r, g, b, a = color
-    for polygon in mesh.polygons:
-        for vert in vertices:
-            for i, index in enumerate(polygon.vertices):
-                if vert.index == index:
-                    loop_index = polygon.loop_indices[i]
-                    mesh.vertex_colors.active.data[loop_index].color = (r, g, b, a)
+def get_member_indices(context, member) -> np.ndarray:
+    """Helper to get the vertex indices of a member in the active mesh"""
+    load_member(context, member)
+
+    if not member.has_indices():
+        # Members saved before vertex indices were stored
+        obj = bpy.data.objects[context.scene.active_mesh]
+        member.set_indices(match_vertex_indices(obj, member.get_points()))
+
+    return member.get_indices()
+
+# -------------------------------------------------------------------
+
+
+def match_vertex_indices(obj, points_cloud) -> np.ndarray:
+    """Find the vertices of a mesh located at the given world coordinates"""
+    points_co = np.asarray(points_cloud, dtype=np.float32).reshape(-1, 3)
+
+    # First mesh vertex at every rounded coordinate (-1 if none), from the cached spatial index
+    indices = mesh_cache.get(obj.data).spatial_index(obj.matrix_world).lookup(points_co)
+    return indices[indices >= 0]
 
 # -------------------------------------------------------------------
 
 
-class JSONLoader:
+def sync_vertex_group(context, member_name, indices=None):
+    """Mirror a member into a vertex group of the active mesh, remove it if `indices` is None"""
+    obj = bpy.data.objects[context.scene.active_mesh]
+    group_name = f"Member {member_name}"
+
+    vertex_group = obj.vertex_groups.get(group_name)
+    if vertex_group is not None:
+        obj.vertex_groups.remove(vertex_group)
+
+    if indices is not None and context.scene.generation_settings.use_vertex_groups:
+        require_mode(mode='OBJECT')  # VertexGroup.add fails in edit mode
+        vertex_group = obj.vertex_groups.new(name=group_name)
+        vertex_group.add(np.asarray(indices).tolist(), 1.0, 'REPLACE')
+
+# -------------------------------------------------------------------
+
+
+def get_loop_vertices(mesh) -> np.ndarray:
+    """Helper to get the (cached) vertex index of every loop of a mesh"""
+    return mesh_cache.get(mesh).loop_vertices
+
+# -------------------------------------------------------------------
+
+
+def color_to_vertices(context, indices, color):
+    """Paint the given vertices of the active mesh, or every vertex if `indices` is None"""
+    require_mode(mode='OBJECT')
+    mesh = bpy.data.objects[context.scene.active_mesh].data
+
+    if not mesh.vertex_colors:
+        mesh.vertex_colors.new()
+    colors_data = mesh.vertex_colors.active.data
+
+    colors = np.empty((len(mesh.loops), 4), dtype=np.float32)
+
+    if indices is None:
+        colors[:] = color
+    else:
+        # Mask of the painted vertices, spread to the polygon corners (loops)
+        indices = np.asarray(indices, dtype=np.int64)
+        painted = np.zeros(len(mesh.vertices), dtype=bool)
+        painted[indices[indices < len(painted)]] = True
+
+        colors_data.foreach_get('color', colors.ravel())
+        colors[painted[get_loop_vertices(mesh)]] = color
 
-    def __init__(self, filepath):
-        self.filename = os.path.basename(filepath)
-        self.path = os.path.dirname(filepath)
+    colors_data.foreach_set('color', colors.ravel())
+    mesh.update()
+
+    mode_set(mode='VERTEX_PAINT')
+
+# -------------------------------------------------------------------
+
+
+class SettingsLoader(formats.SettingsFile):
+    """Scene side of the settings files: the members are written from and loaded
+    into the scene, the file access is left to the format (see `formats`)"""
 
     def save(self, scene):
         filepath = os.path.join(self.path, self.filename)
@@ -135,8 +433,7 @@ class JSONLoader:
             if os.path.isfile(filepath):
                 os.remove(filepath)
 
-            with open(filepath, 'w') as f:
-                f.write(json.dumps(self.to_serializable(scene), indent=2))
+            self.write(self.to_serializable(scene))
         except IOError:
             print(f"Could not save setting file in {filepath}.")
 
@@ -146,36 +443,173 @@ class JSONLoader:
         out_data = {}
 
         for key, value in data.items():
-            points_cloud = []
-
-            for point in value.points_cloud.values():
-                points_cloud.append(point.get())
-
-            out_data[key] = points_cloud
+            out_data[key] = {
+                "points": value.get_points(),
+                "indices": value.get_indices() if value.has_indices() else None,
+            }
 
         return out_data
-        
+
     def load(self, scene):
         filepath = os.path.join(self.path, self.filename)
 
         try:
-            raw_data = []
+            self.to_blender(self.read(), scene)
+        except IOError:
+            print(f"Could not open setting file in {filepath}.")
 
-            with open(filepath, 'r') as f:
-                raw_data = json.load(f)
+    def load_lazy(self, scene):
+        """Only read the list of members, their data is materialized by `load_member` when needed"""
+        filepath = os.path.join(self.path, self.filename)
+        scene.selected_members.clear()
 
-            self.to_blender(raw_data, scene)
+        try:
+            for name, count in self.read_header().items():
+                prop = scene.selected_members.add()
+                prop.name = name
+                prop.point_count = count
+                prop.source = filepath
         except IOError:
             print(f"Could not open setting file in {filepath}.")
 
     @classmethod
     def to_blender(cls, data, scene):
         scene.selected_members.clear()
+        obj = bpy.data.objects.get(scene.active_mesh)
 
         for name, value in data.items():
             prop = scene.selected_members.add()
             prop.name = name
-            prop.points_cloud.clear()
-            for point in value:
-                new_point = prop.points_cloud.add()
-                new_point.set(point)    
+            cls.to_member(value, prop, obj)
+
+    @classmethod
+    def to_member(cls, value, prop, obj):
+        prop.set_points(value["points"])
+        prop.source = ""
+
+        if obj is None or obj.type != 'MESH':
+            return
+
+        # Stored indices survive a move of the object: they are trusted as long as they
+        # fit the mesh, the vertices are only found back from the coordinates otherwise
+        indices = value["indices"]
+        if not is_valid_indices(obj, indices, value["points"]):
+            indices = match_vertex_indices(obj, value["points"])
+        prop.set_indices(indices)
+
+# -------------------------------------------------------------------
+
+
+class JSONLoader(SettingsLoader, formats.JSONFile):
+    """Text format, `{member: [[x, y, z], ...]}`"""
+
+
+# -------------------------------------------------------------------
+
+
+class BinaryLoader(SettingsLoader, formats.BinaryFile):
+    """Binary format, see `formats.BinaryFile`"""
+
+
+# -------------------------------------------------------------------
+
+
+def get_member_sources(filepath) -> dict:
+    """Points of every member of a settings file as chunk sources for `backend.compute_bones_generation_streaming`.
+
+    The members of a .bgen file stay memory-mapped, only the chunk being read is in memory.
+    """
+    return {name: value["points"] for name, value in get_loader(filepath).read().items()}
+
+# -------------------------------------------------------------------
+
+
+SETTINGS_LOADERS = {
+    loader.extension: loader for loader in (JSONLoader, BinaryLoader)
+}
+
+
+def get_loader(filepath) -> SettingsLoader:
+    """Helper to get the settings loader matching the extension of a file (JSON by default)"""
+    extension = os.path.splitext(filepath)[1].lower()
+    return SETTINGS_LOADERS.get(extension, JSONLoader)(filepath)
+
+
+# Loaders of the lazily loaded settings files, kept to parse a file only once
+_lazy_loaders = {}
+
+
+def get_lazy_loader(filepath, reload: bool = False) -> SettingsLoader:
+    loader = _lazy_loaders.get(filepath)
+    if loader is None or reload:
+        loader = _lazy_loaders[filepath] = get_loader(filepath)
+    return loader
+
+
+def load_member(context, member):
+    """Materialize and paint a member from its settings file if it was lazily loaded"""
+    if not member.source:
+        return
+
+    filepath = member.source
+    obj = bpy.data.objects[context.scene.active_mesh]
+
+    if not read_lazy_member(member, obj):
+        return
+
+    indices = member.get_indices()
+    color_to_vertices(context, indices, COLORS[member.name])
+    sync_vertex_group(context, member.name, indices)
+
+    release_lazy_loader(filepath)
+
+
+def read_lazy_member(member, obj) -> bool:
+    """Helper to read a lazily loaded member of `obj` from its settings file, False if it could not be read"""
+    filepath = member.source
+
+    try:
+        value = get_lazy_loader(filepath).read_member(member.name)
+    except (IOError, KeyError):
+        print(f"Could not load member {member.name} from setting file {filepath}.")
+        member.source = ""
+        return False
+
+    SettingsLoader.to_member(value, member, obj)
+    return True
+
+
+def release_lazy_loader(filepath):
+    """Release a parsed settings file once every member of it, in the editor or on any mesh, is loaded"""
+    scene = bpy.context.scene
+    if any(other.source == filepath for other in scene.selected_members):
+        return
+    if any(member.source == filepath for obj in bpy.data.objects for member in obj.bone_generator_members):
+        return
+    _lazy_loaders.pop(filepath, None)
+
+
+def load_members(context):
+    """Helper to materialize every lazily loaded member"""
+    for member in context.scene.selected_members:
+        load_member(context, member)
+
+
+def convert_settings(source, destination):
+    """Convert a settings file to the format of `destination` (e.g. an old .json file to .bgen)"""
+    get_loader(destination).write(get_loader(source).read())
+
+# -------------------------------------------------------------------
+
+
+def is_valid_indices(obj, indices, points_cloud) -> bool:
+    """Check if stored vertex indices fit the mesh: one per stored point, all in range.
+
+    The coordinates are not compared, the world coordinates of a moved object differ from
+    the stored ones while its indices are still right.
+    """
+    if indices is None or len(indices) != len(points_cloud):
+        return False
+
+    indices = np.asarray(indices)
+    return not len(indices) or (indices.min() >= 0 and indices.max() < len(obj.data.vertices))